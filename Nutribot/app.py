@@ -1,11 +1,9 @@
-from flask import Flask, request
+from flask import Flask, request, jsonify
 from telegram import Update, Bot
+import atexit
 import asyncio
 import logging
-import nest_asyncio
-
-# Allow nested event loops
-nest_asyncio.apply()
+import threading
 
 app = Flask(__name__)
 
@@ -26,19 +24,29 @@ from main import setup_handlers
 setup_handlers()
 application = main.application
 
-async def setup_webhook():
-    """Set up webhook with Telegram"""
-    # Initialize the application properly
-    await application.initialize()
-    await application.start()
-    
-    webhook_url = f"{Config.WEBHOOK_URL}/webhook"
-    await application.bot.set_webhook(url=webhook_url)
-    print(f"Webhook registered: {webhook_url}")
-    print("Bot ready to receive updates")
+# The bot lives on one event loop running in a background thread, so work it hands
+# off to tasks (queued scans, voice transcription, video polling) keeps running
+# between webhook requests rather than only while a request is being handled
+bot_loop = asyncio.new_event_loop()
+threading.Thread(target=bot_loop.run_forever, name="telegram-bot", daemon=True).start()
+
+def run_on_bot_loop(coro):
+    """Run a coroutine on the bot's loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, bot_loop).result()
 
-# Register webhook on startup
-asyncio.run(setup_webhook())
+# Initialise the application, open shared clients and register the webhook
+run_on_bot_loop(main.setup_webhook(application))
+
+async def shutdown():
+    """Stop the application and close the shared HTTP / OpenAI clients"""
+    await application.stop()
+    await application.shutdown()
+    await main.on_shutdown(application)  # post_shutdown only runs under run_polling/run_webhook
+
+@atexit.register
+def close_bot():
+    run_on_bot_loop(shutdown())
+    bot_loop.call_soon_threadsafe(bot_loop.stop)
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
@@ -46,8 +54,7 @@ def webhook():
     json_data = request.get_json()
     update = Update.de_json(json_data, application.bot)
     
-    # Process the update with nest_asyncio allowing nested event loops
-    asyncio.run(application.process_update(update))
+    run_on_bot_loop(application.process_update(update))
     
     return '', 200
 
@@ -56,5 +63,11 @@ def health():
     """Health check endpoint"""
     return 'OK', 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage timing percentiles and counters"""
+    from utils.metrics import metrics
+    return jsonify(metrics.snapshot()), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
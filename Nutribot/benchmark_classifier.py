@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local CPU classifier against the remote Clarifai path
+
+Usage: python benchmark_classifier.py <compost|plant> [image files...] [--runs N]
+Without image files a synthetic photo is used.
+"""
+
+import io
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+from config import Config
+from handlers.image_handler import prepare_image
+from services.local_classifier import local_classifier
+
+
+def synthetic_image() -> bytes:
+    """A 12MP noise photo, about the size of a phone camera upload"""
+    pixels = np.random.default_rng(0).integers(0, 255, (3000, 4000, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def time_calls(label, predict, images, runs):
+    """Run predict over every image `runs` times and print latency percentiles"""
+    durations = []
+    failures = 0
+    for _ in range(runs):
+        for image_bytes in images:
+            start = time.perf_counter()
+            try:
+                predict(image_bytes)
+            except Exception as e:
+                failures += 1
+                print(f"   ⚠️ {label} failed: {e}")
+                continue
+            durations.append(time.perf_counter() - start)
+
+    if not durations:
+        print(f"❌ {label}: no successful predictions")
+        return
+    p50, p90, p99 = np.percentile(np.array(durations) * 1000, [50, 90, 99])
+    print(f"✅ {label}: n={len(durations)} p50={p50:.1f}ms p90={p90:.1f}ms p99={p99:.1f}ms failures={failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scan_type", choices=["compost", "plant"])
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-remote", action="store_true", help="Only benchmark the local classifier")
+    args = parser.parse_args()
+
+    print(f"🧪 Classifier Benchmark ({args.scan_type})")
+    print("=" * 60)
+
+    images = []
+    for path in args.images:
+        with open(path, "rb") as image_file:
+            images.append(image_file.read())
+    if not images:
+        images = [synthetic_image()]
+    # Both paths get the same downscaled upload the bot sends
+    images = [prepare_image(image_bytes, Config.CLARIFAI_IMAGE_MAX_SIDE) for image_bytes in images]
+
+    if local_classifier.is_available(args.scan_type):
+        start = time.perf_counter()
+        local_classifier.warm_up()
+        print(f"1. Local model loaded in {(time.perf_counter() - start):.2f}s")
+        time_calls("Local classifier", lambda b: local_classifier.get_top_concepts(args.scan_type, b), images, args.runs)
+    else:
+        print(f"1. ⚠️ No local model in {Config.LOCAL_CLASSIFIER_DIR}, skipping")
+
+    if args.skip_remote:
+        return 0
+
+    from services.clarifai_segmentation import clarifai_pool
+    print("2. Warming up Clarifai client...")
+    clarifai_pool.get(args.scan_type)
+    time_calls("Clarifai", lambda b: clarifai_pool.get_top_concepts(args.scan_type, b), images, args.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
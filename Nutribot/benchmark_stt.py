@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark the speech-to-text backends on sample clips
+
+Usage: python benchmark_stt.py [clip files...] [--runs N] [--backends remote local]
+Reports latency and real-time factor (processing time / clip duration; below 1 is
+faster than real time). Without clip files a synthetic 10 s clip is used, which
+only measures speed - its transcript is meaningless.
+"""
+
+import io
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+import soundfile as sf
+
+from services.speech_to_text import STT_BACKENDS, transcription_clients
+
+
+def synthetic_clip(seconds: float = 10.0, sample_rate: int = 48000) -> bytes:
+    """A voice-note-like Ogg clip: a pulsing tone with background noise"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    rng = np.random.default_rng(0)
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 3 * t) > 0) + 0.02 * rng.standard_normal(t.size)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio.astype(np.float32), sample_rate, format="OGG", subtype="OPUS")
+    return buffer.getvalue()
+
+
+async def time_backend(backend, clips, runs):
+    """Transcribe every clip `runs` times and print latency and real-time factor percentiles"""
+    durations, factors = [], []
+    failures = 0
+    transcript = None
+    for _ in range(runs):
+        for name, audio_bytes, seconds in clips:
+            start = time.perf_counter()
+            try:
+                text = await backend.transcribe(audio_bytes)
+            except Exception as e:
+                failures += 1
+                print(f"   ⚠️ {backend.name} failed on {name}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            durations.append(elapsed)
+            factors.append(elapsed / seconds)
+            transcript = transcript or text
+
+    if not durations:
+        print(f"❌ {backend.name}: no successful transcriptions")
+        return
+    p50, p90 = np.percentile(np.array(durations) * 1000, [50, 90])
+    rtf50, rtf90 = np.percentile(factors, [50, 90])
+    print(f"✅ {backend.name}: n={len(durations)} p50={p50:.0f}ms p90={p90:.0f}ms "
+          f"RTF p50={rtf50:.3f} p90={rtf90:.3f} failures={failures}")
+    print(f"   First transcript: {transcript!r}")
+
+
+async def run(args):
+    clips = []
+    for path in args.clips:
+        with open(path, "rb") as clip_file:
+            audio_bytes = clip_file.read()
+        clips.append((path, audio_bytes, sf.info(io.BytesIO(audio_bytes)).duration))
+    if not clips:
+        clips = [("synthetic", synthetic_clip(), 10.0)]
+    print(f"🎧 {len(clips)} clip(s), {sum(c[2] for c in clips):.1f}s of audio, {args.runs} run(s)")
+
+    for i, name in enumerate(args.backends, 1):
+        backend = STT_BACKENDS[name]()
+        if not backend.is_available():
+            print(f"{i}. ⚠️ {name} backend not available, skipping")
+            continue
+        start = time.perf_counter()
+        backend.warm_up()
+        print(f"{i}. {name} backend ready in {(time.perf_counter() - start):.2f}s")
+        await time_backend(backend, clips, args.runs)
+
+    await transcription_clients.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="*")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", choices=list(STT_BACKENDS), default=list(STT_BACKENDS))
+    args = parser.parse_args()
+
+    print("🧪 Speech-to-Text Benchmark")
+    print("=" * 60)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
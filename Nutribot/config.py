@@ -19,7 +19,11 @@ class Config:
     
     # AI Models & Endpoints
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4.1-mini-2025-04-14")
-    OPENAI_API_URL: str = "https://api.openai.com/v1/chat/completions"
+    # Base URLs can point at a local stand-in (see fake_api_server.py) for offline load tests
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    OPENAI_API_URL: str = f"{OPENAI_BASE_URL}/chat/completions"
+    SYNTHESIA_BASE_URL: str = os.getenv("SYNTHESIA_BASE_URL", "https://api.synthesia.io/v2").rstrip("/")
+    CLARIFAI_BASE_URL: str = (os.getenv("CLARIFAI_BASE_URL") or "").rstrip("/")  # Empty uses the SDK's gRPC API
     
     # Replicate Models
     REPLICATE_SPEECH_MODEL: str = "openai/gpt-4o-transcribe"
@@ -36,17 +40,72 @@ class Config:
     
     # API Timeouts & Limits
     HTTP_TIMEOUT: int = 30
+    HTTP_POOL_LIMIT: int = 100  # Open connections across all API hosts
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_DNS_CACHE_TTL: int = 300  # Seconds
+    HTTP_KEEPALIVE_TIMEOUT: int = 60  # Seconds an idle connection is kept for reuse
+    OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+    CLARIFAI_REQUESTS_PER_MINUTE: int = int(os.getenv("CLARIFAI_REQUESTS_PER_MINUTE", "300"))
+    SYNTHESIA_REQUESTS_PER_MINUTE: int = int(os.getenv("SYNTHESIA_REQUESTS_PER_MINUTE", "30"))
+    API_BURST: int = 10  # Requests allowed back to back before the rate limit applies
+    API_MAX_RETRIES: int = 3  # Retries after a 429 before giving up
     MAX_AUDIO_DURATION: int = 120
     MAX_FOOD_WASTE_INPUT: int = 100
+    CLARIFAI_BRANCH_TIMEOUT: int = 45  # Clarifai detection + interpretation
+    VISION_BRANCH_TIMEOUT: int = 45  # OpenAI Vision assessment
+    ALBUM_COLLECT_DELAY: float = 1.5  # Seconds to wait for the rest of an album to arrive
+    ALBUM_MAX_PARALLEL: int = 3  # Album photos analysed at once, each taking an analysis queue slot (capped by ANALYSIS_MAX_PER_USER)
+    ANALYSIS_MAX_CONCURRENT: int = int(os.getenv("ANALYSIS_MAX_CONCURRENT", "4"))  # Scans running across all users
+    ANALYSIS_MAX_PER_USER: int = 1  # Scans running per user, the rest wait in the queue
+    ANALYSIS_MAX_WAITING: int = int(os.getenv("ANALYSIS_MAX_WAITING", "50"))  # New scans are turned away beyond this
     
     # AI Model Parameters
     AI_MAX_NEW_TOKENS: int = 500
     AI_TEMPERATURE: float = 0.8
     AI_TOP_P: float = 0.9
+    CONVERSATION_TOKEN_BUDGET: int = 1500  # History tokens carried into each Ask Anything prompt
+    CONVERSATION_MAX_SESSIONS: int = 1000  # Users whose conversations are kept in memory
+    CONVERSATION_IDLE_TTL: int = 1800  # Seconds before an idle conversation is forgotten
+    FAQ_CACHE_ENABLED: bool = os.getenv("FAQ_CACHE_ENABLED", "true").lower() == "true"
+    FAQ_CACHE_THRESHOLD: float = 0.85  # Cosine similarity needed to reuse a cached answer
+    FAQ_CACHE_TTL: int = 86400  # Seconds a cached answer is served for
+    FAQ_CACHE_SIZE: int = 500
+    AI_STREAM_RESPONSES: bool = os.getenv("AI_STREAM_RESPONSES", "true").lower() == "true"
+    STREAM_EDIT_INTERVAL: float = 1.0  # Min seconds between edits of a streaming message (Telegram rate limits)
+    
+    # Image Preprocessing (sizes in pixels)
+    CLARIFAI_IMAGE_MAX_SIDE: int = 1024
+    VISION_IMAGE_MAX_SIDE: int = 2048  # OpenAI "high" detail fits images into 2048x2048...
+    VISION_IMAGE_SHORT_SIDE: int = 768  # ...then scales the short side down to 768
+    IMAGE_JPEG_QUALITY: int = 85
+    SCAN_CACHE_SIZE: int = 256  # Cached scan results kept in memory
+    SCAN_CACHE_HASH_DISTANCE: int = 6  # Max differing pHash bits (of 64) for a near-duplicate
+    INTERPRETATION_CACHE_SIZE: int = 512  # Cached Clarifai interpretations
+    INTERPRETATION_CACHE_STEP: float = 0.1  # Confidence bucket width when matching concept sets
+    
+    # Local CPU Image Classifier
+    LOCAL_CLASSIFIER_MODE: str = os.getenv("LOCAL_CLASSIFIER_MODE", "off")  # off | fallback | first
+    LOCAL_CLASSIFIER_DIR: str = os.getenv("LOCAL_CLASSIFIER_DIR", os.path.join(os.path.dirname(__file__), "services", "data", "classifiers"))
+    LOCAL_CLASSIFIER_INPUT_SIZE: int = 224
+    LOCAL_CLASSIFIER_WORKERS: int = 2  # Concurrent predictions
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.6  # "first" mode asks Clarifai below this
+    LOCAL_FALLBACK_AFTER: int = 8  # Seconds to wait for Clarifai before using the local model
     
     # Audio Processing Settings
     AUDIO_SAMPLE_RATE: int = 16000
     AUDIO_CHANNELS: int = 1
+    AUDIO_PREPROCESSING: bool = os.getenv("AUDIO_PREPROCESSING", "true").lower() == "true"
+    AUDIO_SILENCE_THRESHOLD_DB: float = 35.0  # Frames this far below the loudest one count as silence
+    AUDIO_SILENCE_FLOOR_DB: float = -60.0  # Frames quieter than this (dBFS) are always silence
+    AUDIO_SILENCE_PADDING: float = 0.2  # Seconds of silence kept around speech
+    STT_BACKEND: str = os.getenv("STT_BACKEND", "remote").lower()  # remote (OpenAI Whisper) or local
+    LOCAL_STT_MODEL: str = os.getenv("LOCAL_STT_MODEL", os.path.join(os.path.dirname(__file__), "services", "data", "stt", "model.pt"))
+    LOCAL_STT_WORKERS: int = 1  # Concurrent local transcriptions
+    TORCH_THREADS: int = 1  # Torch intra-op threads for the whole process, set once at startup when a local model is used
+    TRANSCRIPTION_TIMEOUT: int = 60  # Seconds for one Whisper upload + transcription
+    TRANSCRIPTION_MAX_CONCURRENT: int = 4  # Whisper requests in flight at once
+    TRANSCRIPTION_MAX_RETRIES: int = 2  # Retries after a connection error or 5xx
+    TRANSCRIPTION_CACHE_SIZE: int = 500  # Voice notes (by Telegram file_unique_id) whose transcripts are kept
     
     # Scientific Constants
     class CompostCalculations:
@@ -74,6 +133,11 @@ class Config:
         PETROL_CO2_FACTOR: float = 2.3  # kg CO2 per litre
         CAR_CO2_FACTOR: float = 0.4  # kg CO2 per mile
     
+    # Metrics & Profiling
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_WINDOW: int = int(os.getenv("METRICS_WINDOW", "1024"))  # Samples kept per timer
+    METRICS_LOG_INTERVAL: int = int(os.getenv("METRICS_LOG_INTERVAL", "300"))  # Seconds, 0 disables
+    
     # Database Configuration
     DATABASE_TABLE: str = "users"
     
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI, Clarifai and Synthesia APIs, for offline load tests
+
+Serves the subset of each API the bot uses (chat/vision completions with SSE
+streaming, Whisper transcription, Clarifai predict, Synthesia videos) with
+configurable latency, error rates and streaming speed. Point the bot at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+    CLARIFAI_BASE_URL=http://127.0.0.1:8089
+    SYNTHESIA_BASE_URL=http://127.0.0.1:8089/v2
+
+Usage: python fake_api_server.py [--port 8089] [--latency lognormal:0.8,0.5] [--error-rate 0.01]
+Latency specs (seconds): fixed:S, uniform:LOW,HIGH, normal:MEAN,STD, lognormal:MEDIAN,SIGMA
+GET /stats returns request counts per endpoint and status.
+"""
+
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from aiohttp import web
+
+LatencySampler = Callable[[random.Random], float]
+
+CHAT_REPLY = (
+    "Your compost looks balanced overall. Keep a mix of about three parts brown material "
+    "(dry leaves, cardboard) to one part green material (fruit and vegetable scraps), "
+    "turn the pile every few days so it gets enough air, and keep it as damp as a wrung-out "
+    "sponge. If it starts to smell, add more browns and turn it; if it stays cold, add greens "
+    "and a little water. Finished compost is dark, crumbly and smells like soil."
+)
+VISION_REPLY = (
+    "The image shows a compost bin with vegetable peels, coffee grounds and some dry leaves. "
+    "The moisture looks about right. Break larger scraps into smaller pieces so they decompose "
+    "faster, and mix in shredded cardboard to balance the fresh food waste."
+)
+TRANSCRIPT = "How much water should I add to my compost"
+
+CONCEPTS = {
+    "segmenter": ["vegetable-peel", "fruit-waste", "coffee-grounds", "dry-leaves", "eggshell", "cardboard"],
+    "classifier": ["healthy", "nitrogen-deficiency", "overwatered", "leaf-spot", "pest-damage"],
+}
+
+
+def parse_latency(spec: str) -> LatencySampler:
+    """Turn a latency spec such as 'lognormal:0.8,0.5' into a sampler returning seconds"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(*values))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec!r}")
+
+
+class FakeAPIServer:
+    """aiohttp app answering like the remote APIs, with injected latency and failures"""
+
+    def __init__(
+        self,
+        latency: Dict[str, LatencySampler],
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        stream_interval: float = 0.02,
+        render_seconds: float = 30.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_interval = stream_interval
+        self.render_seconds = render_seconds
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+        self.videos: Dict[str, float] = {}  # video id -> creation time
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.add_routes([
+            web.post("/v1/chat/completions", self.chat_completions),
+            web.post("/v1/audio/transcriptions", self.transcriptions),
+            web.get("/v2/users/{user_id}/apps/{app_id}/models/{model_id}", self.clarifai_model),
+            web.post("/v2/users/{user_id}/apps/{app_id}/models/{model_id}/outputs", self.clarifai_predict),
+            web.post("/v2/videos", self.create_video),
+            web.get("/v2/videos/{video_id}", self.get_video),
+            web.get("/downloads/{video_id}.mp4", self.download_video),
+            web.get("/stats", self.get_stats),
+        ])
+        return app
+
+    async def _simulate(self, endpoint: str, api: str) -> Optional[web.Response]:
+        """Wait out the sampled latency, then maybe return an injected 429 or 500"""
+        await asyncio.sleep(self.latency[api](self.rng))
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.stats[f"{endpoint} 429"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats[f"{endpoint} 500"] += 1
+            return web.json_response({"error": {"message": "Injected server error", "type": "server_error"}}, status=500)
+        self.stats[f"{endpoint} 200"] += 1
+        return None
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        failure = await self._simulate("chat", "openai")
+        if failure is not None:
+            return failure
+
+        has_image = any(
+            isinstance(message.get("content"), list)
+            and any(part.get("type") == "image_url" for part in message["content"])
+            for message in payload.get("messages", [])
+        )
+        words = (VISION_REPLY if has_image else CHAT_REPLY).split(" ")
+        words = words[:max(1, payload.get("max_tokens", len(words)))]
+        usage = {
+            "prompt_tokens": len(json.dumps(payload.get("messages", []))) // 4,
+            "completion_tokens": len(words),
+            "total_tokens": len(json.dumps(payload.get("messages", []))) // 4 + len(words),
+        }
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-model"),
+        }
+
+        if not payload.get("stream"):
+            return web.json_response({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(choices, **extra):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **extra}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for i, word in enumerate(words):
+            await send([{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}])
+            await asyncio.sleep(self.stream_interval)
+        await send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            await send([], usage=usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def transcriptions(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        failure = await self._simulate("transcription", "openai")
+        if failure is not None:
+            return failure
+        if form.get("response_format") == "text":
+            return web.Response(text=TRANSCRIPT + "\n")
+        return web.json_response({"text": TRANSCRIPT})
+
+    async def clarifai_model(self, request: web.Request) -> web.Response:
+        model_id = request.match_info["model_id"]
+        return web.json_response({"status": {"code": 10000, "description": "Ok"}, "model": {"id": model_id}})
+
+    async def clarifai_predict(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        failure = await self._simulate("clarifai", "clarifai")
+        if failure is not None:
+            return failure
+
+        # Segmentation models answer with regions, classifiers with concepts
+        segmenter = "SEGMENT" in request.match_info["model_id"].upper()
+        names = CONCEPTS["segmenter" if segmenter else "classifier"]
+        outputs = []
+        for item in payload.get("inputs", []):
+            concepts = [
+                {"id": name, "name": name, "value": round(self.rng.uniform(0.05, 0.99), 4)}
+                for name in self.rng.sample(names, k=min(len(names), 4))
+            ]
+            data = {"regions": [{"data": {"concepts": [c]}} for c in concepts]} if segmenter else {"concepts": concepts}
+            outputs.append({
+                "id": uuid.uuid4().hex,
+                "status": {"code": 10000, "description": "Ok"},
+                "input": {"id": item.get("id", uuid.uuid4().hex)},
+                "data": data,
+            })
+        return web.json_response({"status": {"code": 10000, "description": "Ok"}, "outputs": outputs})
+
+    async def create_video(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        failure = await self._simulate("synthesia.create", "synthesia")
+        if failure is not None:
+            return failure
+        video_id = str(uuid.uuid4())
+        self.videos[video_id] = time.monotonic()
+        return web.json_response(
+            {"id": video_id, "title": payload.get("title", ""), "status": "in_progress"},
+            status=201
+        )
+
+    async def get_video(self, request: web.Request) -> web.Response:
+        failure = await self._simulate("synthesia.status", "synthesia")
+        if failure is not None:
+            return failure
+        video_id = request.match_info["video_id"]
+        created = self.videos.get(video_id)
+        if created is None:
+            return web.json_response({"context": "Video not found"}, status=404)
+        if time.monotonic() - created < self.render_seconds:
+            return web.json_response({"id": video_id, "status": "in_progress"})
+        return web.json_response({
+            "id": video_id,
+            "status": "complete",
+            "download": f"{request.url.origin()}/downloads/{video_id}.mp4",
+        })
+
+    async def download_video(self, request: web.Request) -> web.Response:
+        self.stats["synthesia.download 200"] += 1
+        return web.Response(body=b"\x00" * 64 * 1024, content_type="video/mp4")
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(sorted(self.stats.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=parse_latency, default="lognormal:0.5,0.4",
+                        help="Default latency for every API")
+    for api in ("openai", "clarifai", "synthesia"):
+        parser.add_argument(f"--{api}-latency", type=parse_latency, help=f"Latency for {api} (overrides --latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--stream-interval", type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument("--render-seconds", type=float, default=30.0, help="Seconds until a fake video is complete")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    latency = {
+        api: getattr(args, f"{api}_latency") or args.latency
+        for api in ("openai", "clarifai", "synthesia")
+    }
+    server = FakeAPIServer(
+        latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        stream_interval=args.stream_interval,
+        render_seconds=args.render_seconds,
+        seed=args.seed,
+    )
+    print(f"🧪 Fake API server on http://{args.host}:{args.port}")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
+import io
 import os
+import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 # from services.clarifai_segmentation import ClarifaiImageSegmentation  # Lazy loaded when needed
 # Removed unused imports: EmissionsCalculator, FeedCalculator
@@ -9,7 +12,9 @@ from services.extraction_timing import CompostProcessCalculator
 from constants import GREENS_INPUT, MAIN_MENU, COMPOST_HELPER_INPUT, AMA, ML_CROP_SELECTION, ML_GREENS_INPUT, SCAN_TYPE_SELECTION, FEEDING_LOG_INPUT, PLANT_MOISTURE_INPUT, EC_INPUT
 from services.database import db
 from handlers.menu import show_main_menu
-from utils.message_utils import get_cached_user_data
+from utils.message_utils import get_cached_user_data, split_message, StreamingReply
+from utils.metrics import metrics
+from config import Config
 
 # Remove global clarifai instantiation - use lazy loading instead
 logger = logging.getLogger(__name__)
@@ -461,89 +466,27 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         await update.message.reply_text("Please /start to login first.")
         return
     
+    # Photos sent as an album arrive as separate updates sharing a media_group_id
+    media_group_id = update.message.media_group_id
+    if media_group_id and (context.user_data.get("expecting_image") or media_group_id in context.user_data.get("album_scans", {})):
+        return await collect_album_photo(update, context)
+    
     # Check if we're expecting an image
     if context.user_data.get("expecting_image"):
         # Handle both menu and direct scan modes with lazy loading
         context.user_data["expecting_image"] = False
         processing = await update.message.reply_text("🔄 Analysing your image...")
         
-        # Get photo and download it
-        photo = update.message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-        path = f"temp_{update.effective_user.id}.jpg"
-        await file.download_to_drive(path)
-
-        try:
-            # Get scan type from context (default to compost for backward compatibility)
-            scan_type = context.user_data.get("scan_type", "compost")
-            
-            # Use the new dual analysis system
-            from handlers.image_handler import image_analyzer
-            
-            # Update processing message to indicate dual analysis
-            await processing.edit_text("🔄 Performing technical analysis...")
-            
-            # Get dual analysis results
-            analysis_result = await image_analyzer.analyze_image_with_ai_advice(path, scan_type)
-            
-            # Show Clarifai results first (if available)
-            if analysis_result["clarifai_success"]:
-                scan_emoji = "🪣" if scan_type == "compost" else "🌱"
-                scan_name = "Compost Tank" if scan_type == "compost" else "Plant"
-                
-                clarifai_text = f"{scan_emoji} **{scan_name} Analysis Results**\n\n**Top elements detected:**\n"
-                for i, c in enumerate(analysis_result["clarifai_results"], 1):
-                    clarifai_text += f"{i}. {c['name'].title()}: {round(c['value']*100, 1)}%\n"
-                clarifai_text += f"\n💡 Generating expert insights..."
-                
-                await processing.edit_text(clarifai_text, parse_mode="Markdown")
-            else:
-                # If Clarifai fails, update message
-                await processing.edit_text("🔄 Analyzing image with AI vision...")
-            
-            # Send the comprehensive AI analysis as a new message
-            if analysis_result["combined_message"]:
-                await update.message.reply_text(
-                    analysis_result["combined_message"], 
-                    parse_mode="Markdown"
-                )
-            else:
-                # Fallback message
-                await update.message.reply_text(
-                    "⚠️ Unable to analyze the image at this time. Please try again with a clearer photo."
-                )
-            
-            # Add follow-up options after analysis
-            scan_type = context.user_data.get("scan_type", "compost")
-            scan_emoji = "🪣" if scan_type == "compost" else "🌱"
-            scan_name = "Compost Tank" if scan_type == "compost" else "Plant"
-            
-            keyboard = [
-                [InlineKeyboardButton(f"📸 Scan Another {scan_name}", callback_data=f"scan_{scan_type}")],
-                [InlineKeyboardButton("📸 Switch Analysis Type", callback_data="image_scan")],
-                [InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                f"{scan_emoji} **Analysis Complete!**\n\n"
-                "What would you like to do next?",
-                parse_mode="Markdown",
-                reply_markup=reply_markup
-            )
-                
-        except Exception as e:
-            logger.error(f"Image analysis error: {str(e)}")
-            await processing.edit_text(
-                "⚠️ Could not analyse image. Try a clearer photo or check your connection.",
-                parse_mode="Markdown"
-            )
+        from handlers.image_handler import select_photo_size
+        photo = select_photo_size(update.message.photo)
+        # Get scan type from context (default to compost for backward compatibility)
+        scan_type = context.user_data.get("scan_type", "compost")
         
-        try:
-            import os
-            os.remove(path)  # Clean up temp file
-        except:
-            pass
+        # Analyse in the background through the job queue so other updates keep flowing
+        context.application.create_task(
+            run_queued_scan(update, processing, lambda: analyse_photo(update, context, processing, photo, scan_type)),
+            update=update
+        )
         
         # Clean up scan flags
         context.user_data.pop("scan_mode", None)
@@ -556,6 +499,219 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     await update.message.reply_text("Use /scan first to analyze images.")
     return
 
+async def run_queued_scan(update: Update, processing, job, status: str = "🔄 Analysing your image...", weight: int = 1) -> None:
+    """
+    Run a scan job once the analysis queue has room for it, showing the queue
+    position in the processing message while it waits. weight is the number of
+    photos the job analyses at once.
+    """
+    from services.analysis_queue import analysis_queue, AnalysisQueueFull
+    
+    async def show_position(position: int) -> None:
+        await processing.edit_text(f"{status} (#{position} in queue)")
+    
+    try:
+        await analysis_queue.run(update.effective_user.id, job, on_position=show_position, weight=weight)
+    except AnalysisQueueFull:
+        await processing.edit_text("⚠️ Lots of scans are running right now. Please try again in a minute.")
+    except asyncio.CancelledError:
+        logger.info(f"Scan cancelled for user {update.effective_user.id}")
+        try:
+            await processing.edit_text("❌ Scan cancelled.")
+        except Exception:
+            pass
+        raise
+
+async def analyse_photo(update: Update, context: ContextTypes.DEFAULT_TYPE, processing, photo, scan_type: str) -> None:
+    """Download and analyse a single scan photo, replying with the report"""
+    try:
+        # Download straight into memory - no temp file to clean up or collide on
+        file = await context.bot.get_file(photo.file_id)
+        image_buffer = io.BytesIO()
+        await file.download_to_memory(image_buffer)
+        image_bytes = image_buffer.getvalue()
+        
+        # Use the new dual analysis system
+        from handlers.image_handler import image_analyzer
+        
+        # Update processing message to indicate dual analysis
+        await processing.edit_text("🔄 Performing technical analysis...")
+        
+        scan_emoji = "🪣" if scan_type == "compost" else "🌱"
+        scan_name = "Compost Tank" if scan_type == "compost" else "Plant"
+        
+        async def show_clarifai_results(clarifai_results):
+            # Show Clarifai results as soon as they land, while the AI insights are still running
+            clarifai_text = f"{scan_emoji} **{scan_name} Analysis Results**\n\n**Top elements detected:**\n"
+            for i, c in enumerate(clarifai_results, 1):
+                clarifai_text += f"{i}. {c['name'].title()}: {round(c['value']*100, 1)}%\n"
+            clarifai_text += f"\n💡 Generating expert insights..."
+            
+            await processing.edit_text(clarifai_text, parse_mode="Markdown")
+        
+        # The Vision assessment streams into its own reply, which becomes the full report
+        report = StreamingReply(update.message, header=f"{scan_emoji} 👁️ Visual Assessment:\n\n")
+        
+        # Get dual analysis results
+        analysis_result = await image_analyzer.analyze_image_with_ai_advice(
+            image_bytes, scan_type,
+            on_clarifai_results=show_clarifai_results,
+            file_unique_id=photo.file_unique_id,
+            on_vision_partial=report.update if Config.AI_STREAM_RESPONSES else None
+        )
+        
+        if not analysis_result["clarifai_success"]:
+            # If Clarifai fails, update message
+            await processing.edit_text("🔄 Analyzing image with AI vision...")
+        
+        # Send the comprehensive AI analysis as a new message
+        if analysis_result["combined_message"]:
+            await report.finish(
+                analysis_result["combined_message"], 
+                parse_mode="Markdown"
+            )
+        else:
+            # Fallback message
+            await report.finish(
+                "⚠️ Unable to analyze the image at this time. Please try again with a clearer photo."
+            )
+        
+        # Add follow-up options after analysis
+        await send_scan_follow_up(update, scan_type)
+            
+    except Exception as e:
+        logger.error(f"Image analysis error: {str(e)}")
+        await processing.edit_text(
+            "⚠️ Could not analyse image. Try a clearer photo or check your connection.",
+            parse_mode="Markdown"
+        )
+
+async def send_scan_follow_up(update: Update, scan_type: str) -> None:
+    """Offer the next steps after a scan"""
+    scan_emoji = "🪣" if scan_type == "compost" else "🌱"
+    scan_name = "Compost Tank" if scan_type == "compost" else "Plant"
+    
+    keyboard = [
+        [InlineKeyboardButton(f"📸 Scan Another {scan_name}", callback_data=f"scan_{scan_type}")],
+        [InlineKeyboardButton("📸 Switch Analysis Type", callback_data="image_scan")],
+        [InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await update.message.reply_text(
+        f"{scan_emoji} **Analysis Complete!**\n\n"
+        "What would you like to do next?",
+        parse_mode="Markdown",
+        reply_markup=reply_markup
+    )
+
+async def collect_album_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Gather the photos of an album scan. The first photo starts a background task
+    that waits for the rest to arrive, so updates keep flowing in the meantime.
+    """
+    from handlers.image_handler import select_photo_size
+    photo = select_photo_size(update.message.photo)
+    media_group_id = update.message.media_group_id
+    # One entry per media group, so a new album never lands in one still being processed
+    albums = context.user_data.setdefault("album_scans", {})
+    album = albums.get(media_group_id)
+    
+    if album:
+        album["photos"].append(photo)
+        album["last_update"] = asyncio.get_running_loop().time()
+        return MAIN_MENU
+    
+    context.user_data["expecting_image"] = False
+    album = {
+        "media_group_id": media_group_id,
+        "scan_type": context.user_data.get("scan_type", "compost"),
+        "photos": [photo],
+        "last_update": asyncio.get_running_loop().time(),
+    }
+    albums[media_group_id] = album
+    processing = await update.message.reply_text("🔄 Collecting your photos...")
+    task = context.application.create_task(process_album_scan(update, context, processing, album), update=update)
+    
+    # Going back to the menu cancels the album while it's still being collected, too
+    from services.analysis_queue import analysis_queue
+    analysis_queue.track(update.effective_user.id, task)
+    
+    # Clean up scan flags
+    context.user_data.pop("scan_mode", None)
+    context.user_data.pop("scan_type", None)
+    return MAIN_MENU
+
+async def process_album_scan(update: Update, context: ContextTypes.DEFAULT_TYPE, processing, album: dict) -> None:
+    """Analyse a collected album and reply with one consolidated report"""
+    from services.analysis_queue import analysis_queue
+    loop = asyncio.get_running_loop()
+    
+    try:
+        # Wait until no new photo has arrived for ALBUM_COLLECT_DELAY seconds
+        while (remaining := album["last_update"] + Config.ALBUM_COLLECT_DELAY - loop.time()) > 0:
+            await asyncio.sleep(remaining)
+    except asyncio.CancelledError:
+        logger.info(f"Album collection cancelled for user {update.effective_user.id}")
+        try:
+            await processing.edit_text("❌ Scan cancelled.")
+        except Exception:
+            pass
+        raise
+    finally:
+        albums = context.user_data.get("album_scans", {})
+        if albums.get(album["media_group_id"]) is album:
+            del albums[album["media_group_id"]]
+    
+    # Each photo analysed at once takes its own slot in the queue
+    parallel = min(len(album["photos"]), Config.ALBUM_MAX_PARALLEL, analysis_queue.max_weight())
+    await run_queued_scan(
+        update, processing, lambda: analyse_album(update, context, processing, album, parallel),
+        status=f"🔄 Analysing {len(album['photos'])} photos...",
+        weight=parallel
+    )
+
+async def analyse_album(update: Update, context: ContextTypes.DEFAULT_TYPE, processing, album: dict, max_parallel: int) -> None:
+    """Download and analyse the photos of an album, at most max_parallel at once, replying with one report"""
+    scan_type = album["scan_type"]
+    photos = album["photos"]
+    try:
+        await processing.edit_text(f"🔄 Analysing {len(photos)} photos...")
+        
+        async def download(photo) -> bytes:
+            file = await context.bot.get_file(photo.file_id)
+            image_buffer = io.BytesIO()
+            await file.download_to_memory(image_buffer)
+            return image_buffer.getvalue()
+        
+        images = await asyncio.gather(*(download(photo) for photo in photos))
+        
+        from handlers.image_handler import image_analyzer
+        album_result = await image_analyzer.analyze_album(
+            list(images), scan_type,
+            file_unique_ids=[photo.file_unique_id for photo in photos],
+            max_parallel=max_parallel
+        )
+        
+        for chunk in split_message(album_result["combined_message"]):
+            try:
+                await update.message.reply_text(chunk, parse_mode="Markdown")
+            except BadRequest:
+                # A chunk boundary can cut a Markdown entity in half - send that part as plain text
+                await update.message.reply_text(chunk)
+        # Only drop the placeholder once the report is out, so the error path can still edit it
+        await processing.delete()
+        
+        await send_scan_follow_up(update, scan_type)
+    
+    except Exception as e:
+        logger.error(f"Album analysis error: {str(e)}")
+        error_text = "⚠️ Could not analyse these photos. Try clearer photos or check your connection."
+        try:
+            await processing.edit_text(error_text)
+        except BadRequest:
+            await update.message.reply_text(error_text)
+
 async def care_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     telegram_id = update.effective_user.id
     user_data = get_cached_user_data(telegram_id, context)
@@ -783,6 +939,18 @@ async def watering_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await update.message.reply_text("Please /start to login first.")
         return
     
+    # Show the last projection straight from its snapshot - it is only recomputed when a new reading lands.
+    # An older snapshot is shown from today onwards, with the date of the reading it came from.
+    snapshot = context.user_data.get("moisture_snapshot")
+    if snapshot:
+        from services.plant_moisture import PlantMoistureProjection
+        snapshot = PlantMoistureProjection.snapshot_as_of(snapshot)
+    if snapshot:
+        await update.message.reply_text(
+            PlantMoistureProjection.format_projection_message(snapshot),
+            parse_mode="Markdown"
+        )
+    
     # Create keyboard with dashboard option
     keyboard = [
         [InlineKeyboardButton("📊 View Plant Dashboard", callback_data="view_plant_dashboard")],
@@ -876,6 +1044,7 @@ async def compost_helper_input(update, context):
     # return to main menu
     return await show_main_menu(update, context, context.user_data["username"])
 
+@metrics.timed("handler.plant_moisture_input")
 async def handle_plant_moisture_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle plant moisture percentage input and generate projections"""
     try:
@@ -896,35 +1065,12 @@ async def handle_plant_moisture_input(update: Update, context: ContextTypes.DEFA
             )
             return PLANT_MOISTURE_INPUT
         
-        # Generate moisture projection with telegram_id for logging
+        # Build a fresh projection snapshot for the new reading and keep it for /watering
         telegram_id = update.effective_user.id
-        projection_data = moisture_service.generate_moisture_projection(moisture_value, telegram_id)
-        
-        # Create comprehensive dashboard message
-        dashboard_text = f"💧 **Plant Moisture Dashboard**\n\n"
-        dashboard_text += f"📊 **Current Status:**\n"
-        dashboard_text += f"• Current moisture: {moisture_value}%\n"
-        dashboard_text += f"• {projection_data['next_watering_day']}\n\n"
-        
-        # Show watering alerts if any
-        if projection_data['watering_alerts']:
-            dashboard_text += f"🚨 **Watering Alerts (Next 30 Days):**\n"
-            for alert in projection_data['watering_alerts'][:3]:  # Show first 3 alerts
-                dashboard_text += f"• {alert['message']}\n"
-            dashboard_text += "\n"
-        
-        dashboard_text += f"📅 **Next 7 Days Projection:**\n"
-        for proj in projection_data['projections'][:7]:  # Show first 7 days
-            status_emoji = {"critical": "🚨", "low": "⚠️", "moderate": "📊", "good": "✅"}
-            emoji = status_emoji.get(proj['status'], "📊")
-            dashboard_text += f"{emoji} {proj['day_name']}: {proj['moisture_percentage']}%\n"
-        
-        dashboard_text += f"\n🎯 **30-Day Recommendation:**\n"
-        dashboard_text += f"{projection_data['overall_recommendation']}\n\n"
-        
-        # Add care tips
-        tips = moisture_service.get_moisture_tips(moisture_value)
-        dashboard_text += f"💡 **Care Tips:**\n{tips}"
+        snapshot = moisture_service.build_projection_snapshot(moisture_value, telegram_id)
+        context.user_data["moisture_snapshot"] = snapshot
+        
+        dashboard_text = moisture_service.format_projection_message(snapshot)
         
         # Create back to menu button
         keyboard = [[InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]]
@@ -948,6 +1094,7 @@ async def handle_plant_moisture_input(update: Update, context: ContextTypes.DEFA
         username = context.user_data.get("username") or context.user_data.get("login_username")
         return await show_main_menu(update, context, username)
 
+@metrics.timed("handler.ec_input")
 async def handle_ec_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle EC and moisture input for ML prediction"""
     try:
@@ -1026,7 +1173,8 @@ async def handle_ec_input(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         # Save to database with predictions
         telegram_id = update.effective_user.id
-        compost_status = db.create_compost_status_with_predictions(telegram_id, ec_value, moisture_percentage, prediction_result)
+        with metrics.timer("ec_forecast.db_write"):
+            compost_status = db.create_compost_status_with_predictions(telegram_id, ec_value, moisture_percentage, prediction_result)
         
         if not compost_status:
             await processing_msg.edit_text(
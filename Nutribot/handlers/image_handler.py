@@ -3,15 +3,69 @@ Image Analysis Handler for Nutribot
 Handles dual AI analysis: Clarifai + OpenAI Vision
 """
 
+import io
 import os
+import asyncio
 import logging
 import base64
-from typing import Dict, List, Optional, Tuple
-from services.clarifai_segmentation import ClarifaiImageSegmentation
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Union
+from PIL import Image, ImageOps
+from services.clarifai_segmentation import clarifai_pool
+from services.local_classifier import local_classifier
+from services.api_scheduler import api_schedulers, PRIORITY_INTERACTIVE, PRIORITY_INTERPRETATION, PRIORITY_BATCH
 from services.llama_interface import LlamaInterface
+from services.scan_cache import InterpretationCache, ScanResultCache, perceptual_hash
+from config import Config
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Per-model input targets: longest side cap and optional shortest side cap, in pixels
+IMAGE_TARGETS = {
+    "clarifai": {"max_side": Config.CLARIFAI_IMAGE_MAX_SIDE, "short_side": None},
+    "vision": {"max_side": Config.VISION_IMAGE_MAX_SIDE, "short_side": Config.VISION_IMAGE_SHORT_SIDE},
+}
+
+
+def select_photo_size(photo_sizes: Sequence, min_short_side: int = Config.VISION_IMAGE_SHORT_SIDE):
+    """
+    Pick the smallest Telegram photo variant that is still large enough for analysis.
+    
+    Telegram sends each photo in several sizes; anything with a short side above what
+    the models use is downscaled on their end anyway, so downloading it is wasted.
+    Falls back to the largest variant when none is big enough.
+    """
+    for photo_size in sorted(photo_sizes, key=lambda p: p.width * p.height):
+        if min(photo_size.width, photo_size.height) >= min_short_side:
+            return photo_size
+    return photo_sizes[-1]
+
+
+def prepare_image(image_bytes: bytes, max_side: int, short_side: Optional[int] = None,
+                  quality: int = Config.IMAGE_JPEG_QUALITY) -> bytes:
+    """
+    Downscale an image to fit a model's input size and re-encode it as JPEG.
+    
+    Returns the original bytes if re-encoding would not make the upload smaller.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        scale = min(1.0, max_side / max(width, height))
+        if short_side:
+            scale = min(scale, short_side / min(width, height))
+        
+        if scale < 1.0:
+            image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    
+    prepared = output.getvalue()
+    return prepared if len(prepared) < len(image_bytes) else image_bytes
+
 
 class ImageAnalysisHandler:
     """
@@ -21,9 +75,10 @@ class ImageAnalysisHandler:
     
     def __init__(self):
         self.llama = LlamaInterface()
+        self.scan_cache = ScanResultCache()
+        self.interpretation_cache = InterpretationCache()
         
         # Log environment variable status
-        from config import Config
         logger.info(f"CLARIFAI_TANK_PAT set: {bool(Config.CLARIFAI_TANK_PAT)}")
         logger.info(f"CLARIFAI_PLANT_PAT set: {bool(Config.CLARIFAI_PLANT_PAT)}")
         logger.info(f"CLARIFAI_PAT (legacy) set: {bool(Config.CLARIFAI_PAT)}")
@@ -31,19 +86,175 @@ class ImageAnalysisHandler:
     
     async def analyze_image_with_ai_advice(
         self, 
-        image_path: str, 
-        scan_type: str
+        image: Union[str, bytes], 
+        scan_type: str,
+        on_clarifai_results: Optional[Callable[[List[Dict]], Awaitable[None]]] = None,
+        file_unique_id: Optional[str] = None,
+        on_vision_partial: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict:
         """
         Perform dual analysis: Clarifai + OpenAI interpretation AND independent OpenAI Vision
         
+        The two branches run concurrently, each with its own timeout. Results from a
+        branch that fails or times out are simply left out, so a slow service never
+        blocks the other one.
+        
         Args:
-            image_path (str): Path to the image file
+            image (str | bytes): Image bytes, or a path to an image file
             scan_type (str): "compost" or "plant"
+            on_clarifai_results: Optional coroutine called with the Clarifai concepts as
+                soon as they land, before the interpretation and Vision results
+            file_unique_id: Telegram file_unique_id, used to spot exact resends in the cache
+            on_vision_partial: Optional coroutine called with the Vision assessment text
+                received so far while it streams in
             
         Returns:
             Dict: Analysis results with structured advice
         """
+        # Repeated scans of the same file are answered straight from the cache
+        cached = self.scan_cache.get_by_file_id(scan_type, file_unique_id)
+        if cached:
+            return await self._deliver_cached(cached, on_clarifai_results)
+        
+        # Load the image into memory once
+        if isinstance(image, (bytes, bytearray)):
+            image_bytes = bytes(image)
+        else:
+            with open(image, "rb") as image_file:
+                image_bytes = image_file.read()
+        
+        # ...and so are near-identical photos, matched by perceptual hash
+        image_hash = await self._hash_image(image_bytes)
+        if image_hash is not None:
+            cached = self.scan_cache.get_by_hash(scan_type, image_hash)
+            if cached:
+                return await self._deliver_cached(cached, on_clarifai_results)
+        
+        return await self._analyze_uncached(
+            image_bytes, image_hash, scan_type,
+            on_clarifai_results=on_clarifai_results,
+            file_unique_id=file_unique_id,
+            on_vision_partial=on_vision_partial
+        )
+    
+    async def analyze_album(
+        self,
+        images: List[bytes],
+        scan_type: str,
+        file_unique_ids: Optional[List[Optional[str]]] = None,
+        max_parallel: int = Config.ALBUM_MAX_PARALLEL
+    ) -> Dict:
+        """
+        Analyse an album of photos and build one consolidated report
+        
+        Uncached photos go to Clarifai together in a single multi-input request (minus
+        those the local classifier is confident about in "first" mode), then
+        their interpretation and Vision branches run with at most max_parallel
+        photos in flight at once.
+        
+        Args:
+            images (List[bytes]): Image bytes for each photo, in album order
+            scan_type (str): "compost" or "plant"
+            file_unique_ids: Telegram file_unique_id for each photo, if known
+            max_parallel (int): Photos analysed at once - the analysis queue slots the album holds
+            
+        Returns:
+            Dict: Per-photo results and the consolidated report message
+        """
+        file_unique_ids = file_unique_ids or [None] * len(images)
+        results: List[Optional[Dict]] = [None] * len(images)
+        hashes: List[Optional[int]] = [None] * len(images)
+        pending = []
+        
+        for i, (image_bytes, file_unique_id) in enumerate(zip(images, file_unique_ids)):
+            cached = self.scan_cache.get_by_file_id(scan_type, file_unique_id)
+            if cached is None:
+                hashes[i] = await self._hash_image(image_bytes)
+                if hashes[i] is not None:
+                    cached = self.scan_cache.get_by_hash(scan_type, hashes[i])
+            if cached:
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        if pending:
+            clarifai_inputs = dict(zip(pending, await asyncio.gather(*(
+                self._prepare_for_model(images[i], "clarifai") for i in pending
+            ))))
+            use_local = Config.LOCAL_CLASSIFIER_MODE in ("first", "fallback") and local_classifier.is_available(scan_type)
+            local_concepts: Dict[int, Optional[List[Dict]]] = {}
+            photo_concepts: Dict[int, List[Dict]] = {}
+            
+            # "first" mode: photos the local model is confident about skip the remote batch
+            if use_local and Config.LOCAL_CLASSIFIER_MODE == "first":
+                local_concepts = dict(zip(pending, await asyncio.gather(*(
+                    self._analyze_locally(clarifai_inputs[i], scan_type) for i in pending
+                ))))
+                for i, concepts in local_concepts.items():
+                    if concepts and concepts[0]["value"] >= Config.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+                        photo_concepts[i] = concepts
+            
+            remote = [i for i in pending if i not in photo_concepts]
+            if remote:
+                try:
+                    batch_concepts = await asyncio.wait_for(
+                        api_schedulers["clarifai"].call(
+                            lambda: asyncio.to_thread(
+                                clarifai_pool.get_top_concepts_batch, scan_type, [clarifai_inputs[i] for i in remote], 5
+                            ),
+                            PRIORITY_BATCH
+                        ),
+                        timeout=Config.CLARIFAI_BRANCH_TIMEOUT
+                    )
+                    photo_concepts.update(zip(remote, batch_concepts))
+                except Exception as e:
+                    logger.error(f"Clarifai batch analysis failed for {scan_type}: {str(e)}")
+                    if use_local:
+                        metrics.increment(f"local_classifier.fallbacks.{scan_type}", len(remote))
+                        # "first" mode already ran the local model on these photos
+                        missing = [i for i in remote if i not in local_concepts]
+                        local_concepts.update(zip(missing, await asyncio.gather(*(
+                            self._analyze_locally(clarifai_inputs[i], scan_type) for i in missing
+                        ))))
+                    for i in remote:
+                        photo_concepts[i] = local_concepts.get(i) or []
+            
+            semaphore = asyncio.Semaphore(max(1, max_parallel))
+            
+            async def analyze_photo(i: int, concepts: List[Dict]) -> None:
+                async with semaphore:
+                    results[i] = await self._analyze_uncached(
+                        images[i], hashes[i], scan_type,
+                        file_unique_id=file_unique_ids[i],
+                        clarifai_results=concepts,
+                        priority=PRIORITY_BATCH
+                    )
+            
+            await asyncio.gather(*(analyze_photo(i, photo_concepts[i]) for i in pending))
+        
+        return {
+            "results": results,
+            "combined_message": self._format_album_report(results, scan_type)
+        }
+    
+    async def _analyze_uncached(
+        self,
+        image_bytes: bytes,
+        image_hash: Optional[int],
+        scan_type: str,
+        on_clarifai_results: Optional[Callable[[List[Dict]], Awaitable[None]]] = None,
+        file_unique_id: Optional[str] = None,
+        clarifai_results: Optional[List[Dict]] = None,
+        on_vision_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Dict:
+        """
+        Run both analysis branches for one image and cache complete results
+        
+        clarifai_results skips Clarifai detection when it has already been done
+        (an empty list means it was attempted and found nothing). priority is the
+        API scheduling class for the whole scan.
+        """
         result = {
             "clarifai_success": False,
             "vision_success": False,
@@ -53,57 +264,210 @@ class ImageAnalysisHandler:
             "combined_message": ""
         }
         
-        # Step 1: Try Clarifai Analysis
-        clarifai_results = await self._analyze_with_clarifai(image_path, scan_type)
-        if clarifai_results:
-            result["clarifai_success"] = True
-            result["clarifai_results"] = clarifai_results
-            
-            # Step 2: Get OpenAI interpretation of Clarifai results
-            interpretation = await self._interpret_clarifai_results(clarifai_results, scan_type)
-            result["clarifai_interpretation"] = interpretation
+        # Shrink the image to what each model actually uses before uploading it
+        if clarifai_results is None:
+            clarifai_bytes, vision_bytes = await asyncio.gather(
+                self._prepare_for_model(image_bytes, "clarifai"),
+                self._prepare_for_model(image_bytes, "vision"),
+            )
+        else:
+            clarifai_bytes, vision_bytes = None, await self._prepare_for_model(image_bytes, "vision")
         
-        # Step 3: Independent OpenAI Vision Analysis (always attempted)
-        vision_analysis = await self._analyze_with_openai_vision(image_path, scan_type)
-        if vision_analysis:
-            result["vision_success"] = True
-            result["vision_analysis"] = vision_analysis
+        await asyncio.gather(
+            self._run_branch(
+                "Clarifai",
+                self._clarifai_branch(clarifai_bytes, scan_type, result, on_clarifai_results, clarifai_results, priority),
+                Config.CLARIFAI_BRANCH_TIMEOUT
+            ),
+            self._run_branch(
+                "OpenAI Vision",
+                self._vision_branch(vision_bytes, scan_type, result, on_vision_partial, priority),
+                Config.VISION_BRANCH_TIMEOUT
+            ),
+        )
         
-        # Step 4: Format combined response
+        # Format combined response from whatever finished in time
         result["combined_message"] = self._format_combined_response(result, scan_type)
         
+        if image_hash is not None and self._is_cacheable(result):
+            self.scan_cache.put(scan_type, image_hash, result, file_unique_id)
+        
         return result
     
+    async def _hash_image(self, image_bytes: bytes) -> Optional[int]:
+        """Perceptual hash for the scan cache, or None if the image can't be hashed"""
+        try:
+            return await asyncio.to_thread(perceptual_hash, image_bytes)
+        except Exception as e:
+            logger.warning(f"Perceptual hashing failed, skipping scan cache: {str(e)}")
+            return None
+    
+    async def _deliver_cached(
+        self,
+        cached: Dict,
+        on_clarifai_results: Optional[Callable[[List[Dict]], Awaitable[None]]]
+    ) -> Dict:
+        """Return a cached result, replaying the partial Clarifai delivery"""
+        logger.info("Serving scan result from cache")
+        if on_clarifai_results and cached["clarifai_success"]:
+            try:
+                await on_clarifai_results(cached["clarifai_results"])
+            except Exception as e:
+                logger.warning(f"Partial Clarifai result delivery failed: {str(e)}")
+        return cached
+    
+    @staticmethod
+    def _is_cacheable(result: Dict) -> bool:
+        """Only cache complete results - never timeouts or the LLM's apology fallbacks"""
+        if not (result["clarifai_success"] and result["vision_success"]):
+            return False
+        texts = (result["clarifai_interpretation"], result["vision_analysis"])
+        return all(text and not text.startswith("Sorry,") for text in texts)
+    
+    async def _prepare_for_model(self, image_bytes: bytes, model: str) -> bytes:
+        """Resize and re-encode the image for one model off the event loop, logging the bytes saved"""
+        target = IMAGE_TARGETS[model]
+        try:
+            prepared = await asyncio.to_thread(prepare_image, image_bytes, target["max_side"], target["short_side"])
+        except Exception as e:
+            logger.warning(f"Image preprocessing for {model} failed, sending original: {str(e)}")
+            return image_bytes
+        
+        saved = len(image_bytes) - len(prepared)
+        logger.info(f"Prepared {model} image: {len(image_bytes)} -> {len(prepared)} bytes ({saved} saved)")
+        metrics.increment(f"image.bytes_saved.{model}", saved)
+        return prepared
+    
+    async def _run_branch(self, name: str, branch: Awaitable[None], timeout: float) -> None:
+        """Await one analysis branch, giving up on it after its timeout"""
+        try:
+            await asyncio.wait_for(branch, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{name} branch timed out after {timeout}s - delivering partial results")
+        except Exception as e:
+            logger.error(f"{name} branch failed: {str(e)}")
+    
+    async def _clarifai_branch(
+        self, 
+        image_bytes: bytes, 
+        scan_type: str,
+        result: Dict,
+        on_clarifai_results: Optional[Callable[[List[Dict]], Awaitable[None]]],
+        clarifai_results: Optional[List[Dict]] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> None:
+        """
+        Clarifai detection followed by OpenAI interpretation of its results
+        """
+        if clarifai_results is None:
+            clarifai_results = await self._analyze_with_clarifai(image_bytes, scan_type, priority)
+        if not clarifai_results:
+            return
+        
+        result["clarifai_success"] = True
+        result["clarifai_results"] = clarifai_results
+        
+        if on_clarifai_results:
+            try:
+                await on_clarifai_results(clarifai_results)
+            except Exception as e:
+                logger.warning(f"Partial Clarifai result delivery failed: {str(e)}")
+        
+        # The interpretation is secondary to the Vision assessment the user is waiting on
+        result["clarifai_interpretation"] = await self._interpret_clarifai_results(
+            clarifai_results, scan_type, max(priority, PRIORITY_INTERPRETATION)
+        )
+    
+    async def _vision_branch(
+        self,
+        image_bytes: bytes,
+        scan_type: str,
+        result: Dict,
+        on_vision_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> None:
+        """
+        Independent OpenAI Vision assessment
+        """
+        vision_analysis = await self._analyze_with_openai_vision(image_bytes, scan_type, on_vision_partial, priority)
+        if vision_analysis:
+            result["vision_success"] = True
+            result["vision_analysis"] = vision_analysis
+    
     async def _analyze_with_clarifai(
         self, 
-        image_path: str, 
-        scan_type: str
+        image_bytes: bytes, 
+        scan_type: str,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> Optional[List[Dict]]:
         """
-        Analyze image with Clarifai model
+        Analyze image with Clarifai model, using the local classifier as a first
+        pass or fallback depending on LOCAL_CLASSIFIER_MODE
         """
+        use_local = Config.LOCAL_CLASSIFIER_MODE in ("first", "fallback") and local_classifier.is_available(scan_type)
+        local_concepts = None
+        
+        if use_local and Config.LOCAL_CLASSIFIER_MODE == "first":
+            local_concepts = await self._analyze_locally(image_bytes, scan_type)
+            if local_concepts and local_concepts[0]["value"] >= Config.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+                return local_concepts
+        
         try:
-            logger.info(f"Starting Clarifai analysis for {scan_type} with image: {image_path}")
-            clarifai = ClarifaiImageSegmentation(model_type=scan_type)
-            logger.info(f"Clarifai instance created successfully for {scan_type}")
-            top_concepts = clarifai.get_top_concepts(image_path, top_n=5)
+            logger.info(f"Starting Clarifai analysis for {scan_type} ({len(image_bytes)} bytes)")
+            # Clarifai's client is a blocking gRPC call - keep it off the event loop
+            clarifai_call = api_schedulers["clarifai"].call(
+                lambda: asyncio.to_thread(self._clarifai_top_concepts, image_bytes, scan_type), priority
+            )
+            if use_local and Config.LOCAL_CLASSIFIER_MODE == "fallback":
+                clarifai_call = asyncio.wait_for(clarifai_call, timeout=Config.LOCAL_FALLBACK_AFTER)
+            top_concepts = await clarifai_call
             logger.info(f"Clarifai analysis successful: {len(top_concepts)} concepts found")
-            return top_concepts
+            if top_concepts or not use_local:
+                return top_concepts
         except Exception as e:
             logger.error(f"Clarifai analysis failed for {scan_type}: {str(e)}")
             logger.error(f"Exception type: {type(e).__name__}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+            if not use_local:
+                import traceback
+                logger.error(f"Full traceback: {traceback.format_exc()}")
+                return None
+        
+        # Clarifai is slow, down or unsure - answer from the local model instead
+        metrics.increment(f"local_classifier.fallbacks.{scan_type}")
+        if local_concepts is not None:
+            # "first" mode already ran the local model on this image
+            return local_concepts
+        return await self._analyze_locally(image_bytes, scan_type)
+    
+    async def _analyze_locally(self, image_bytes: bytes, scan_type: str) -> Optional[List[Dict]]:
+        """
+        Analyze image with the on-CPU classifier
+        """
+        try:
+            return await local_classifier.top_concepts(scan_type, image_bytes, top_n=5)
+        except Exception as e:
+            logger.error(f"Local classifier failed for {scan_type}: {str(e)}")
             return None
     
+    @staticmethod
+    def _clarifai_top_concepts(image_bytes: bytes, scan_type: str) -> List[Dict]:
+        """Blocking Clarifai prediction on the pooled client, run in a worker thread"""
+        return clarifai_pool.get_top_concepts(scan_type, image_bytes, top_n=5)
+    
     async def _interpret_clarifai_results(
         self, 
         clarifai_results: List[Dict], 
-        scan_type: str
+        scan_type: str,
+        priority: int = PRIORITY_INTERPRETATION
     ) -> Optional[str]:
         """
         Use OpenAI to interpret Clarifai technical results
         """
+        # Common concept sets have usually been interpreted already
+        cached = self.interpretation_cache.get(scan_type, clarifai_results)
+        if cached:
+            return cached
+        
         try:
             # Format Clarifai results for AI interpretation
             results_text = "\n".join([
@@ -137,7 +501,11 @@ Provide expert interpretation focusing on:
 
 Keep the response concise and practical for home gardeners."""
             
-            interpretation = await self.llama.generate_response(prompt, max_length=400)
+            interpretation = await self.llama.generate_response(
+                prompt, max_length=400, priority=priority, caller="clarifai_interpretation"
+            )
+            if interpretation and not interpretation.startswith("Sorry,"):
+                self.interpretation_cache.put(scan_type, clarifai_results, interpretation)
             return interpretation
             
         except Exception as e:
@@ -146,18 +514,19 @@ Keep the response concise and practical for home gardeners."""
     
     async def _analyze_with_openai_vision(
         self, 
-        image_path: str, 
-        scan_type: str
+        image_bytes: bytes, 
+        scan_type: str,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> Optional[str]:
         """
         Analyze image directly with OpenAI Vision API
         """
         try:
-            logger.info(f"Starting OpenAI Vision analysis for {scan_type} with image: {image_path}")
+            logger.info(f"Starting OpenAI Vision analysis for {scan_type} ({len(image_bytes)} bytes)")
             
-            # Convert image to base64
-            with open(image_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+            # Convert the shared image buffer to base64
+            base64_image = base64.b64encode(image_bytes).decode('utf-8')
             logger.info(f"Image successfully converted to base64, size: {len(base64_image)} characters")
             
             if scan_type == "compost":
@@ -181,7 +550,9 @@ Be practical and specific in your advice for home composters."""
 Be practical and specific in your advice for home gardeners."""
             
             logger.info(f"Calling OpenAI Vision API for {scan_type}")
-            vision_analysis = await self.llama.analyze_image_with_vision(base64_image, prompt)
+            vision_analysis = await self.llama.analyze_image_with_vision(
+                base64_image, prompt, on_partial=on_partial, priority=priority
+            )
             logger.info(f"OpenAI Vision analysis successful, response length: {len(vision_analysis) if vision_analysis else 0}")
             return vision_analysis
             
@@ -239,6 +610,21 @@ Be practical and specific in your advice for home gardeners."""
             message = f"⚠️ Unable to analyze the {scan_name.lower()} image at this time. Please try again with a clearer photo or check your connection."
         
         return message
+    
+    def _format_album_report(self, results: List[Dict], scan_type: str) -> str:
+        """
+        Format one consolidated report for an album scan
+        """
+        scan_emoji = "🪣" if scan_type == "compost" else "🌱"
+        scan_name = "Compost Tank" if scan_type == "compost" else "Plant"
+        
+        analysed = sum(1 for r in results if r["clarifai_success"] or r["vision_success"])
+        message = f"{scan_emoji} **{scan_name} Album Analysis ({analysed}/{len(results)} photos analysed)**"
+        
+        for i, result in enumerate(results, 1):
+            message += f"\n\n📷 **Photo {i}**\n{result['combined_message']}"
+        
+        return message
 
 
 # Global instance for easy import
@@ -4,6 +4,9 @@ from telegram.ext import ContextTypes
 from services.llama_interface import LlamaInterface
 from handlers.menu import show_main_menu
 from constants import AMA
+from config import Config
+from utils.message_utils import StreamingReply
+from services.faq_cache import faq_cache
 
 logger = logging.getLogger(__name__)
 llama = LlamaInterface()
@@ -24,7 +27,7 @@ async def llama_response(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # 3a) Allow only /menu and /back to exit AMA mode
     if text.lower() in ['/menu', '/back']:
         context.user_data.pop("state", None)
-        llama.clear_memory()
+        llama.clear_memory(update.effective_user.id)
         return await show_main_menu(update, context)
 
     # 3b) Block all other /commands
@@ -34,8 +37,29 @@ async def llama_response(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # 4) Send the prompt to LLM
     try:
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
-        resp = await llama.generate_response(text)
+        user_id = update.effective_user.id
+        reply = StreamingReply(update.message)
+        
+        # Only standalone questions use the FAQ cache - a follow-up's answer depends on the conversation
+        standalone = not llama.conversations.history(user_id)
+        
+        # Common questions are answered from the local FAQ cache without an API call
+        cached = faq_cache.lookup(text) if Config.FAQ_CACHE_ENABLED and standalone else None
+        if cached:
+            resp = cached["answer"]
+            llama.conversations.append(user_id, text, resp)
+        else:
+            await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+            
+            # Stream the answer into the chat as it is generated
+            resp = await llama.generate_response(
+                text,
+                on_partial=reply.update if Config.AI_STREAM_RESPONSES else None,
+                conversation_id=user_id,
+                caller="ama"
+            )
+            if Config.FAQ_CACHE_ENABLED and standalone and not resp.startswith("Sorry,"):
+                faq_cache.add(text, resp)
         
         # Store the response for potential video generation
         context.user_data["last_ama_response"] = resp
@@ -44,7 +68,7 @@ async def llama_response(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         keyboard = [[InlineKeyboardButton("🎬 Create Video", callback_data=f"create_video")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(resp, reply_markup=reply_markup)
+        await reply.finish(resp, reply_markup=reply_markup)
     except Exception as e:
         logger.error(f"Llama error: {e}")
         await update.message.reply_text(
@@ -2,6 +2,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from services.database import db
 from utils.message_utils import get_cached_user_data, clear_user_cache
+from services.analysis_queue import analysis_queue
 from constants import MAIN_MENU, CO2_FOOD_WASTE_INPUT, COMPOST_HELPER_INPUT, AMA, SCAN_TYPE_SELECTION, EC_FORECAST_SELECTION, EC_INPUT
 # from services.clarifai_segmentation import ClarifaiImageSegmentation  # Lazy loaded when needed
 import os
@@ -55,6 +56,8 @@ async def back_to_menu_command(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data.pop("scan_mode", None)
     context.user_data.pop("scan_type", None)
     context.user_data.pop("expecting_image", None)
+    # Leaving the scan flow cancels any scans still queued or running
+    analysis_queue.cancel_user(update.effective_user.id)
     # Call the existing menu (no username arg)
     return await show_main_menu(update, context)
 
@@ -69,58 +72,12 @@ async def back_to_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.edit_message_text("🔒 Please /start and login first.")
         return
     
+    # Leaving the scan flow cancels any scans still queued or running
+    analysis_queue.cancel_user(update.effective_user.id)
+    
     # Show main menu
     return await show_main_menu(update, context, username)
 
-async def handle_photo_from_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle photo processing when user sends image after selecting image_scan from menu"""
-    user = context.user_data.get("username")
-    if not user:
-        await update.message.reply_text("Please /start to login first.")
-        return MAIN_MENU
-    
-    if not context.user_data.get("expecting_image"):
-        await update.message.reply_text("Use the Image Scan option from the menu first.")
-        return MAIN_MENU
-
-    context.user_data["expecting_image"] = False
-    processing = await update.message.reply_text("🔄 Analysing your image...")
-    photo = update.message.photo[-1]
-    file = await context.bot.get_file(photo.file_id)
-    path = f"temp_{update.effective_user.id}.jpg"
-    await file.download_to_drive(path)
-
-    try:
-        # Lazy load Clarifai only when needed
-        from services.clarifai_segmentation import ClarifaiImageSegmentation
-        clarifai = ClarifaiImageSegmentation()
-        top = clarifai.get_top_concepts(path, top_n=5)
-        text = "🔍 **Image Analysis Results**\n\n**Top elements:**\n"
-        for i,c in enumerate(top,1):
-            text += f"{i}. {c['name'].title()}: {round(c['value']*100,1)}%\n"
-        text += "\n💡 Ask me questions about what you see!"
-    except Exception:
-        text = "⚠️ Could not analyse image. Try a clearer photo."
-
-    try: 
-        os.remove(path)
-    except: 
-        pass
-
-    await processing.delete()
-    
-    # Create back to menu button
-    kb = [[InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")]]
-    reply_markup = InlineKeyboardMarkup(kb)
-    
-    await update.message.reply_text(
-        text, 
-        parse_mode="Markdown",
-        reply_markup=reply_markup
-    )
-    
-    return MAIN_MENU
-
 async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     q = update.callback_query; await q.answer()
     choice = q.data
@@ -534,6 +491,7 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         context.user_data.pop("scan_type", None)
         context.user_data.pop("expecting_image", None)
         context.user_data.pop("selected_crop", None)
+        analysis_queue.cancel_user(update.effective_user.id)
         
         return await show_main_menu(update, context, user)
 
@@ -4,9 +4,10 @@ import io
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from services.speech_to_text import transcribe_audio_memory
+from services.speech_to_text import transcribe_audio_memory, transcription_cache
 from constants import KEYWORD_TRIGGERS, AMA
 from handlers.llama_handler import llama_response
+from utils.intent_matcher import IntentMatcher
 from config import Config
 from handlers.auth import help_command
 from handlers.commands import (
@@ -37,6 +38,11 @@ INTENT_HANDLERS = {
     "help_commands":  help_command,
 }
 
+# Compiled once - only intents with a handler can be matched
+VOICE_INTENTS = IntentMatcher({
+    intent: keywords for intent, keywords in KEYWORD_TRIGGERS.items() if intent in INTENT_HANDLERS
+})
+
 MAX_AUDIO_DURATION = Config.MAX_AUDIO_DURATION  # seconds
 
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -50,18 +56,29 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    file = await context.bot.get_file(voice.file_id)
+    # Download + transcription take seconds - run them off the update queue so other chats aren't held up
+    context.application.create_task(transcribe_voice(update, context), update=update)
+
+async def transcribe_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Download and transcribe a voice message, then route it as a command"""
+    voice = update.message.voice
 
     try:
-        await update.message.reply_text("🎤 Processing your voice…")
-        
-        # Download audio data directly to memory
-        ogg_buffer = io.BytesIO()
-        await file.download_to_memory(ogg_buffer)
-        ogg_buffer.seek(0)
-
-        # Transcribe audio directly from OGG buffer using OpenAI Whisper
-        transcription = await transcribe_audio_memory(ogg_buffer)
+        # Forwarded or resent voice notes keep their file_unique_id - skip the download and STT call
+        transcription = transcription_cache.get(voice.file_unique_id)
+        if transcription is None:
+            file = await context.bot.get_file(voice.file_id)
+            await update.message.reply_text("🎤 Processing your voice…")
+            
+            # Download audio data directly to memory
+            ogg_buffer = io.BytesIO()
+            await file.download_to_memory(ogg_buffer)
+            ogg_buffer.seek(0)
+
+            # Transcribe audio directly from OGG buffer
+            transcription = await transcribe_audio_memory(ogg_buffer)
+            transcription_cache.put(voice.file_unique_id, transcription)
+
         if not transcription:
             await update.message.reply_text(
                 "❌ I didn't catch that—please try again."
@@ -79,7 +96,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await process_voice_command(update, context, transcription.lower())
 
     except Exception as e:
-        logger.error(f"Error in handle_voice: {e}")
+        logger.error(f"Error in transcribe_voice: {e}")
         await update.message.reply_text(
             "❌ Something went wrong. Please try again."
         )
@@ -97,14 +114,13 @@ async def process_voice_command(
         await update.message.reply_text("💬 Passing your voice message to NutriBot…")
         return await llama_response(update, context)
 
-    # 2) Otherwise, try to match one of the keyword intents first:
-    matched = None
-    for intent, keywords in KEYWORD_TRIGGERS.items():
-        if any(kw.lower() in transcription for kw in keywords):
-            matched = intent
-            break
+    # 2) Otherwise, route to the most specific keyword intent:
+    match = VOICE_INTENTS.best(transcription)
+    matched = match["intent"] if match else None
+    if match:
+        logger.info(f"Voice intent '{matched}' from {match['keyword']!r} at {match['span']} (score {match['score']})")
 
-    if matched and matched in INTENT_HANDLERS:
+    if matched:
         try:
             await INTENT_HANDLERS[matched](update, context)
         except Exception as e:
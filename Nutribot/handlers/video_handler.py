@@ -1,11 +1,11 @@
 import logging
 import asyncio
-import aiohttp
 import os
 import io
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from services.synthesia_client import SynthesiaClient
+from services.http_session import http_pool
 from constants import AMA
 
 logger = logging.getLogger(__name__)
@@ -111,29 +111,29 @@ async def check_video_status(context: ContextTypes.DEFAULT_TYPE, chat_id: int, v
                 if download_url:
                     try:
                         # Download video data directly to memory
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(download_url) as video_response:
-                                if video_response.status == 200:
-                                    # Read entire video into memory
-                                    video_data = await video_response.read()
+                        session = http_pool.get()
+                        async with session.get(download_url) as video_response:
+                            if video_response.status == 200:
+                                # Read entire video into memory
+                                video_data = await video_response.read()
+                                
+                                # Send video directly from memory using BytesIO
+                                video_buffer = io.BytesIO(video_data)
+                                video_buffer.name = f"nutribot_advice_{video_id[:8]}.mp4"
+                                
+                                await context.bot.send_video(
+                                    chat_id=chat_id,
+                                    video=video_buffer,
+                                    caption="🎉 Your NutriBot advice video is ready!\n\n💡 This video contains your previous gardening/composting advice.",
+                                    supports_streaming=True
+                                )
                                     
-                                    # Send video directly from memory using BytesIO
-                                    video_buffer = io.BytesIO(video_data)
-                                    video_buffer.name = f"nutribot_advice_{video_id[:8]}.mp4"
-                                    
-                                    await context.bot.send_video(
-                                        chat_id=chat_id,
-                                        video=video_buffer,
-                                        caption="🎉 Your NutriBot advice video is ready!\n\n💡 This video contains your previous gardening/composting advice.",
-                                        supports_streaming=True
-                                    )
-                                        
-                                else:
-                                    # Fallback message if download fails
-                                    await context.bot.send_message(
-                                        chat_id=chat_id,
-                                        text="🎉 Your video is ready!\n\n📹 Video processing complete. "
-                                    )
+                            else:
+                                # Fallback message if download fails
+                                await context.bot.send_message(
+                                    chat_id=chat_id,
+                                    text="🎉 Your video is ready!\n\n📹 Video processing complete. "
+                                )
                     except Exception as e:
                         logger.error(f"Error downloading/sending video: {e}")
                         # Fallback message
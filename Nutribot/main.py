@@ -92,10 +92,56 @@ from handlers.ama_helpers import block_commands_during_ama
 async def set_bot_commands(application):
     await application.bot.set_my_commands(COMMANDS)
 
+async def check_clarifai_health():
+    """Build the Clarifai clients and log whether they can reach the API"""
+    from services.clarifai_segmentation import clarifai_pool
+    logger = logging.getLogger(__name__)
+    try:
+        health = await asyncio.wait_for(asyncio.to_thread(clarifai_pool.health), Config.CLARIFAI_BRANCH_TIMEOUT)
+        logger.info(f"Clarifai health: {health}")
+    except asyncio.TimeoutError:
+        logger.warning(f"Clarifai health check timed out after {Config.CLARIFAI_BRANCH_TIMEOUT}s")
+
+async def on_startup(application):
+    """Runs once the bot is initialised, before it starts taking updates"""
+    # Open the pooled HTTP session shared by all outbound API clients
+    from services.http_session import http_pool
+    await http_pool.start()
+    
+    await set_bot_commands(application)
+    
+    # Check Clarifai in the background so a slow or unreachable API doesn't hold up startup
+    application.create_task(check_clarifai_health(), name="clarifai_health")
+    
+    # Torch's thread count is process-wide, so set it here once for every local model
+    if Config.LOCAL_CLASSIFIER_MODE != "off" or Config.STT_BACKEND == "local":
+        try:
+            import torch
+            torch.set_num_threads(Config.TORCH_THREADS)
+        except ImportError:
+            logging.getLogger(__name__).warning("torch is not installed, local models are unavailable")
+    
+    # Load the local image classifier now rather than on the first scan
+    if Config.LOCAL_CLASSIFIER_MODE != "off":
+        from services.local_classifier import local_classifier
+        await asyncio.to_thread(local_classifier.warm_up)
+    
+    if Config.STT_BACKEND == "local":
+        from services.speech_to_text import stt_backend
+        await asyncio.to_thread(stt_backend.warm_up)
+
+async def on_shutdown(application):
+    """Runs after the bot stops taking updates"""
+    from services.http_session import http_pool
+    from services.speech_to_text import transcription_clients
+    await http_pool.close()
+    await transcription_clients.close()
+
 async def setup_webhook(application):
     """Set up webhook for the bot"""
     await application.initialize()
     await application.start()
+    await on_startup(application)  # post_init only runs under run_polling/run_webhook
     
     # Set webhook URL
     webhook_url = f"{Config.WEBHOOK_URL}/webhook"
@@ -110,7 +156,7 @@ application = None
 def create_application():
     """Create and configure the application"""
     Config.validate_required_env_vars()
-    return Application.builder().token(Config.TELEGRAM_TOKEN).post_init(set_bot_commands).build()
+    return Application.builder().token(Config.TELEGRAM_TOKEN).post_init(on_startup).post_shutdown(on_shutdown).build()
 
 def setup_handlers():
     """Set up all conversation and command handlers"""
@@ -0,0 +1,173 @@
+"""
+Bounded queue for image analysis jobs.
+
+Caps how many scans run at once, both overall and per user, so a burst of photos
+can't exhaust the Clarifai/OpenAI quotas or hold dozens of images in memory.
+Jobs wait in FIFO order (skipping users already at their cap), waiting callers are
+told their position as it changes, and a user's jobs can be cancelled when they
+leave the scan flow. A job that analyses several photos at once (an album) takes
+one slot per photo in flight, so it counts against the same caps.
+"""
+
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AnalysisQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class _Job:
+    def __init__(self, user_id: int, weight: int):
+        self.user_id = user_id
+        self.weight = weight
+        self.task: Optional[asyncio.Task] = asyncio.current_task()
+        self.started = False
+        self.moved = asyncio.Event()
+
+
+class AnalysisQueue:
+    """Runs analysis jobs under global and per-user concurrency caps"""
+
+    def __init__(
+        self,
+        max_concurrent: int = Config.ANALYSIS_MAX_CONCURRENT,
+        max_per_user: int = Config.ANALYSIS_MAX_PER_USER,
+        max_waiting: int = Config.ANALYSIS_MAX_WAITING
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_waiting = max_waiting
+        self._waiting: List[_Job] = []
+        self._running: List[_Job] = []
+        self._running_slots = 0
+        self._running_per_user: Dict[int, int] = defaultdict(int)
+        # Tasks that will queue a job once they're ready (e.g. album collection)
+        self._tracked: Dict[int, Set[asyncio.Task]] = defaultdict(set)
+
+    async def run(
+        self,
+        user_id: int,
+        job: Callable[[], Awaitable[T]],
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+        weight: int = 1
+    ) -> T:
+        """
+        Wait for free slots, then run job() in the calling task.
+
+        weight is how many slots the job occupies, at most max_weight(). on_position
+        is called with the 1-based queue position whenever it changes while waiting.
+        Raises AnalysisQueueFull if the queue is at capacity and
+        asyncio.CancelledError if the job is cancelled.
+        """
+        if len(self._waiting) >= self.max_waiting:
+            metrics.increment("analysis_queue.rejected")
+            raise AnalysisQueueFull(f"{len(self._waiting)} jobs already waiting")
+
+        entry = _Job(user_id, max(1, min(weight, self.max_weight())))
+        self._waiting.append(entry)
+        self._dispatch()
+        queued_at = time.perf_counter()
+
+        try:
+            last_position = None
+            while not entry.started:
+                position = self._waiting.index(entry) + 1
+                if on_position and position != last_position:
+                    try:
+                        await on_position(position)
+                    except Exception as e:
+                        logger.warning(f"Queue position update failed: {e}")
+                    last_position = position
+                if entry.started:
+                    break
+                entry.moved.clear()
+                await entry.moved.wait()
+        except BaseException:
+            if entry.started:
+                self._release(entry)
+            else:
+                self._waiting.remove(entry)
+                self._notify_waiting()
+            raise
+
+        metrics.observe("analysis_queue.wait", time.perf_counter() - queued_at)
+        try:
+            return await job()
+        finally:
+            self._release(entry)
+
+    def max_weight(self) -> int:
+        """Most slots a single job can take"""
+        return min(self.max_concurrent, self.max_per_user)
+
+    def track(self, user_id: int, task: asyncio.Task) -> None:
+        """Let cancel_user also cancel a task before it has queued its job"""
+        self._tracked[user_id].add(task)
+        task.add_done_callback(lambda done: self._untrack(user_id, done))
+
+    def cancel_user(self, user_id: int) -> int:
+        """Cancel every tracked, waiting and running job of a user; returns how many were cancelled"""
+        tasks = set(self._tracked.get(user_id, ()))
+        tasks.update(entry.task for entry in self._waiting + self._running if entry.user_id == user_id and entry.task)
+        cancelled = 0
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                cancelled += 1
+        if cancelled:
+            metrics.increment("analysis_queue.cancelled", cancelled)
+            logger.info(f"Cancelled {cancelled} analysis job(s) for user {user_id}")
+        return cancelled
+
+    def stats(self) -> Dict[str, int]:
+        """Current queue depth, running job count and slots in use"""
+        return {"waiting": len(self._waiting), "running": len(self._running), "slots": self._running_slots}
+
+    def _dispatch(self) -> None:
+        """Start waiting jobs, oldest first, while there are free slots"""
+        for entry in list(self._waiting):
+            # A heavy job at the front holds the rest back rather than being starved by lighter ones
+            if self._running_slots + entry.weight > self.max_concurrent:
+                break
+            if self._running_per_user[entry.user_id] + entry.weight > self.max_per_user:
+                continue
+            self._waiting.remove(entry)
+            self._running.append(entry)
+            self._running_slots += entry.weight
+            self._running_per_user[entry.user_id] += entry.weight
+            entry.started = True
+            entry.moved.set()
+        self._notify_waiting()
+
+    def _release(self, entry: _Job) -> None:
+        """Free a running job's slot and start whoever is next"""
+        self._running.remove(entry)
+        self._running_slots -= entry.weight
+        self._running_per_user[entry.user_id] -= entry.weight
+        if not self._running_per_user[entry.user_id]:
+            del self._running_per_user[entry.user_id]
+        self._dispatch()
+
+    def _untrack(self, user_id: int, task: asyncio.Task) -> None:
+        self._tracked[user_id].discard(task)
+        if not self._tracked[user_id]:
+            del self._tracked[user_id]
+
+    def _notify_waiting(self) -> None:
+        for entry in self._waiting:
+            entry.moved.set()
+
+
+# Global instance for easy import
+analysis_queue = AnalysisQueue()
@@ -0,0 +1,175 @@
+"""
+Client-side rate control for outbound API calls (OpenAI, Clarifai, Synthesia).
+
+Each API gets a token bucket sized to its quota. Callers wait for a token in
+priority order (interactive > interpretation > batch, FIFO within a class), so a
+user waiting on an answer never queues behind background work. A rate-limited
+response pauses the whole bucket for its Retry-After (or an exponential backoff)
+before the call is retried. A waiting call's priority can be raised, e.g. when
+a more urgent caller joins a coalesced request.
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple, TypeVar, Union
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priority classes, most urgent first
+PRIORITY_INTERACTIVE, PRIORITY_INTERPRETATION, PRIORITY_BATCH = range(3)
+
+
+class RateLimited(Exception):
+    """Raised by a scheduled call when the API answered 429"""
+
+    def __init__(self, retry_after: Optional[float] = None, body: str = ""):
+        super().__init__(f"Rate limited (retry after {retry_after}s)")
+        self.retry_after = retry_after
+        self.body = body
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from retry-after-ms / Retry-After (delta seconds or HTTP date)"""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CallPriority:
+    """Priority of a scheduled call that can be raised while it waits for a token"""
+
+    def __init__(self, priority: int):
+        self.value = priority
+        # (scheduler, heap entry) for every acquire currently waiting with this priority
+        self._waiting: List[Tuple["TokenBucketScheduler", list]] = []
+
+    def raise_to(self, priority: int) -> None:
+        """Move the call up to a more urgent priority class; lower ones are ignored"""
+        if priority >= self.value:
+            return
+        self.value = priority
+        for scheduler, entry in self._waiting:
+            scheduler._reprioritise(entry, priority)
+
+
+class TokenBucketScheduler:
+    """Priority-ordered token bucket for one API; a rate of 0 or less means unlimited"""
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int, max_retries: int = Config.API_MAX_RETRIES):
+        self.name = name
+        self.rate = max(requests_per_minute, 0) / 60
+        self.burst = burst
+        self.max_retries = max_retries
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        # [priority, sequence, event] - the event wakes a waiter when it reaches the front
+        self._waiting: List[list] = []
+        self._sequence = itertools.count()
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        priority: Union[int, CallPriority] = PRIORITY_INTERACTIVE
+    ) -> T:
+        """
+        Run request() once a token is available, retrying on RateLimited up to
+        max_retries times. The last RateLimited is re-raised if retries run out.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(priority)
+            try:
+                return await request()
+            except RateLimited as e:
+                metrics.increment(f"scheduler.{self.name}.rate_limited")
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else min(2 ** attempt, 30)
+                logger.warning(f"[{self.name}] Rate limited, pausing {delay:.1f}s (attempt {attempt + 1})")
+                self.pause(delay)
+
+    async def acquire(self, priority: Union[int, CallPriority] = PRIORITY_INTERACTIVE) -> None:
+        """Wait for a token, behind every waiter of the same or higher priority"""
+        shared = priority if isinstance(priority, CallPriority) else None
+        entry = [shared.value if shared else priority, next(self._sequence), asyncio.Event()]
+        heapq.heappush(self._waiting, entry)
+        if shared:
+            shared._waiting.append((self, entry))
+        self._report_depth()
+        queued_at = time.perf_counter()
+
+        try:
+            while True:
+                if self._waiting[0] is not entry:
+                    entry[2].clear()
+                    await entry[2].wait()
+                    continue
+
+                self._refill()
+                delay = max(self._paused_until - time.monotonic(), 0.0)
+                if not delay and not self.rate:
+                    break
+                if not delay and self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep(delay or (1 - self._tokens) / self.rate)
+        finally:
+            if shared:
+                shared._waiting.remove((self, entry))
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            if self._waiting:
+                self._waiting[0][2].set()
+            self._report_depth()
+
+        metrics.observe(f"scheduler.{self.name}.wait", time.perf_counter() - queued_at)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call to this API for the given time (e.g. after a 429)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _reprioritise(self, entry: list, priority: int) -> None:
+        if entry not in self._waiting:
+            return
+        entry[0] = priority
+        heapq.heapify(self._waiting)
+        self._waiting[0][2].set()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _report_depth(self) -> None:
+        metrics.set_gauge(f"scheduler.{self.name}.queued", len(self._waiting))
+
+
+# One scheduler per outbound API
+api_schedulers: Dict[str, TokenBucketScheduler] = {
+    "openai": TokenBucketScheduler("openai", Config.OPENAI_REQUESTS_PER_MINUTE, Config.API_BURST),
+    "clarifai": TokenBucketScheduler("clarifai", Config.CLARIFAI_REQUESTS_PER_MINUTE, Config.API_BURST),
+    "synthesia": TokenBucketScheduler("synthesia", Config.SYNTHESIA_REQUESTS_PER_MINUTE, Config.API_BURST),
+}
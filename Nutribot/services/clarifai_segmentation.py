@@ -1,7 +1,77 @@
 import os
+import json
+import time
+import base64
+import logging
+import threading
+from types import SimpleNamespace
 from typing import List, Dict, Union
+from urllib.parse import urlparse
+import requests
 from clarifai.client.model import Model
 from config import Config
+from services.api_scheduler import RateLimited, parse_retry_after
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Throttling shows up as a CONN_THROTTLED status in the failed response (which the SDK
+# raises as a plain Exception) or as a gRPC RESOURCE_EXHAUSTED error
+_THROTTLED_MARKERS = ("CONN_THROTTLED", "RESOURCE_EXHAUSTED")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether a Clarifai SDK error means the request was throttled"""
+    return any(marker in str(error) for marker in _THROTTLED_MARKERS)
+
+
+class ClarifaiRESTModel:
+    """
+    Minimal stand-in for clarifai's Model that calls the JSON REST API instead of gRPC.
+    
+    Used when CLARIFAI_BASE_URL is set, e.g. to run against fake_api_server.py.
+    Responses are parsed into attribute objects so they read like the SDK's protobufs.
+    """
+    def __init__(self, url: str, pat: str, base_url: str):
+        user_id, app_id, _, model_id = urlparse(url).path.strip("/").split("/")[:4]
+        self.endpoint = f"{base_url}/v2/users/{user_id}/apps/{app_id}/models/{model_id}"
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Key {pat}"})
+
+    def predict_by_bytes(self, input_bytes: bytes, input_type: str = "image"):
+        return self._predict([{"data": {"image": {"base64": base64.b64encode(input_bytes).decode()}}}])
+
+    def predict_by_filepath(self, filepath: str, input_type: str = "image"):
+        with open(filepath, "rb") as f:
+            return self.predict_by_bytes(f.read(), input_type)
+
+    def predict_by_url(self, url: str, input_type: str = "image"):
+        return self._predict([{"data": {"image": {"url": url}}}])
+
+    def predict(self, inputs: list):
+        """Predict for clarifai Inputs protos built from bytes"""
+        return self._predict([
+            {"id": item.id, "data": {"image": {"base64": base64.b64encode(item.data.image.base64).decode()}}}
+            for item in inputs
+        ])
+
+    def load_info(self):
+        return self._call("GET", self.endpoint)
+
+    def _predict(self, inputs: List[Dict]):
+        return self._call("POST", f"{self.endpoint}/outputs", json={"inputs": inputs})
+
+    def _call(self, method: str, url: str, **kwargs):
+        response = self.session.request(method, url, timeout=Config.HTTP_TIMEOUT, **kwargs)
+        if response.status_code == 429:
+            raise RateLimited(parse_retry_after(response.headers), response.text)
+        response.raise_for_status()
+        result = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+        if result.status.code != 10000:
+            raise RuntimeError(f"Clarifai request failed: {result.status.description}")
+        return result
+
 
 class ClarifaiImageSegmentation:
     """
@@ -24,7 +94,10 @@ class ClarifaiImageSegmentation:
         if not self.pat:
             raise ValueError(f"No Clarifai PAT found for {model_type} model. Check environment variables.")
         
-        self.model = Model(url=self.model_url, pat=self.pat)
+        if Config.CLARIFAI_BASE_URL:
+            self.model = ClarifaiRESTModel(self.model_url, self.pat, Config.CLARIFAI_BASE_URL)
+        else:
+            self.model = Model(url=self.model_url, pat=self.pat)
 
     def analyse_image(self, image_path: str) -> List[Dict[str, Union[str, float]]]:
         """
@@ -35,41 +108,41 @@ class ClarifaiImageSegmentation:
 
         # Use the local file path directly
         model_prediction = self.model.predict_by_filepath(image_path)
+        return self._extract_concepts(model_prediction)
+
+    def analyse_image_bytes(self, image_bytes: bytes) -> List[Dict[str, Union[str, float]]]:
+        """
+        Analyse in-memory image bytes and return segmentation/classification results.
+        """
+        model_prediction = self.model.predict_by_bytes(image_bytes, input_type="image")
+        return self._extract_concepts(model_prediction)
+
+    def analyse_images_bytes(self, images: List[bytes]) -> List[List[Dict[str, Union[str, float]]]]:
+        """
+        Analyse several in-memory images with a single multi-input prediction request.
+        Returns one result list per image, in input order.
+        """
+        from clarifai.client.input import Inputs
         
-        results = []
-        output_data = model_prediction.outputs[0].data
-        
-        # Handle segmentation models (compost) - results in regions
-        if hasattr(output_data, 'regions') and output_data.regions:
-            for region in output_data.regions:
-                for concept in region.data.concepts:
-                    name = concept.name
-                    value = round(concept.value, 4)
-                    results.append({
-                        'name': name,
-                        'value': value
-                    })
-        
-        # Handle classification models (plant) - results in direct concepts
-        elif hasattr(output_data, 'concepts') and output_data.concepts:
-            for concept in output_data.concepts:
-                name = concept.name
-                value = round(concept.value, 4)
-                results.append({
-                    'name': name,
-                    'value': value
-                })
-        
-        return results
+        inputs = [
+            Inputs.get_input_from_bytes(input_id=f"image-{i}", image_bytes=image_bytes)
+            for i, image_bytes in enumerate(images)
+        ]
+        model_prediction = self.model.predict(inputs=inputs)
+        return [self._extract_concepts(model_prediction, index=i) for i in range(len(images))]
 
     def analyse_image_by_url(self, image_url: str) -> List[Dict[str, Union[str, float]]]:
         """
         Analyse an image by URL and return segmentation/classification results.
         """
         model_prediction = self.model.predict_by_url(image_url)
-        
+        return self._extract_concepts(model_prediction)
+
+    @staticmethod
+    def _extract_concepts(model_prediction, index: int = 0) -> List[Dict[str, Union[str, float]]]:
+        """Flatten one output of a Clarifai prediction into name/value concept dicts."""
         results = []
-        output_data = model_prediction.outputs[0].data
+        output_data = model_prediction.outputs[index].data
         
         # Handle segmentation models (compost) - results in regions
         if hasattr(output_data, 'regions') and output_data.regions:
@@ -102,7 +175,110 @@ class ClarifaiImageSegmentation:
         except Exception as e:
             print(f"Error: {e}")
 
-    def get_top_concepts(self, image_path: str, top_n: int = 5) -> List[Dict[str, Union[str, float]]]:
-        """Return the top-N concepts by confidence."""
-        results = self.analyse_image(image_path)
-        return sorted(results, key=lambda x: x['value'], reverse=True)[:top_n]
\ No newline at end of file
+    def get_top_concepts(self, image: Union[str, bytes], top_n: int = 5) -> List[Dict[str, Union[str, float]]]:
+        """Return the top-N concepts by confidence for an image path or in-memory bytes."""
+        if isinstance(image, (bytes, bytearray)):
+            results = self.analyse_image_bytes(bytes(image))
+        else:
+            results = self.analyse_image(image)
+        return sorted(results, key=lambda x: x['value'], reverse=True)[:top_n]
+
+    def get_top_concepts_batch(self, images: List[bytes], top_n: int = 5) -> List[List[Dict[str, Union[str, float]]]]:
+        """Return the top-N concepts for each of several in-memory images, in one request."""
+        return [
+            sorted(results, key=lambda x: x['value'], reverse=True)[:top_n]
+            for results in self.analyse_images_bytes(images)
+        ]
+
+
+class ClarifaiModelPool:
+    """
+    Long-lived Clarifai clients, one per model type, created lazily on first use.
+    
+    Building a Model repeats auth and gRPC channel setup, so clients are reused
+    across scans. gRPC channels are thread-safe, which lets worker threads share
+    a client; a client whose call fails is dropped and rebuilt on next use.
+    """
+    MODEL_TYPES = ("compost", "plant")
+    
+    def __init__(self):
+        self._clients: Dict[str, ClarifaiImageSegmentation] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, model_type: str = "compost") -> ClarifaiImageSegmentation:
+        """Return the shared client for a model type, creating it on first use"""
+        client = self._clients.get(model_type)
+        if client is not None:
+            return client
+        
+        with self._lock:
+            client = self._clients.get(model_type)
+            if client is None:
+                start = time.perf_counter()
+                client = ClarifaiImageSegmentation(model_type=model_type)
+                elapsed = time.perf_counter() - start
+                metrics.observe(f"clarifai.client_init.{model_type}", elapsed)
+                logger.info(f"Clarifai {model_type} client initialised in {elapsed:.2f}s")
+                self._clients[model_type] = client
+            return client
+    
+    def invalidate(self, model_type: str) -> None:
+        """Drop a client so the next call builds a fresh one"""
+        with self._lock:
+            self._clients.pop(model_type, None)
+    
+    def get_top_concepts(self, model_type: str, image: Union[str, bytes], top_n: int = 5) -> List[Dict[str, Union[str, float]]]:
+        """Top-N concepts using the pooled client, recording per-call latency"""
+        client = self.get(model_type)
+        start = time.perf_counter()
+        try:
+            return client.get_top_concepts(image, top_n=top_n)
+        except (FileNotFoundError, RateLimited):
+            raise
+        except Exception as e:
+            if is_rate_limited(e):
+                raise RateLimited(body=str(e)) from e
+            metrics.increment(f"clarifai.errors.{model_type}")
+            self.invalidate(model_type)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe(f"clarifai.predict.{model_type}", elapsed)
+            logger.info(f"Clarifai {model_type} prediction took {elapsed:.2f}s")
+    
+    def get_top_concepts_batch(self, model_type: str, images: List[bytes], top_n: int = 5) -> List[List[Dict[str, Union[str, float]]]]:
+        """Top-N concepts for several images in one multi-input request on the pooled client"""
+        client = self.get(model_type)
+        start = time.perf_counter()
+        try:
+            return client.get_top_concepts_batch(images, top_n=top_n)
+        except RateLimited:
+            raise
+        except Exception as e:
+            if is_rate_limited(e):
+                raise RateLimited(body=str(e)) from e
+            metrics.increment(f"clarifai.errors.{model_type}")
+            self.invalidate(model_type)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe(f"clarifai.predict_batch.{model_type}", elapsed)
+            logger.info(f"Clarifai {model_type} batch prediction of {len(images)} images took {elapsed:.2f}s")
+    
+    def health_check(self, model_type: str) -> bool:
+        """Check that the client for a model type can reach Clarifai"""
+        try:
+            self.get(model_type).model.load_info()
+            return True
+        except Exception as e:
+            logger.warning(f"Clarifai {model_type} health check failed: {e}")
+            self.invalidate(model_type)
+            return False
+    
+    def health(self) -> Dict[str, bool]:
+        """Health of every configured model type"""
+        return {model_type: self.health_check(model_type) for model_type in self.MODEL_TYPES}
+
+
+# Global pool for easy import
+clarifai_pool = ClarifaiModelPool()
@@ -0,0 +1,91 @@
+"""
+Per-user conversation memory for the LLM.
+
+Each user's history is trimmed to a token budget, oldest exchanges first, so a
+prompt only ever carries that user's own recent context. Idle sessions expire and
+the least recently used ones are evicted once there are too many.
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Hashable, List
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English), plus per-message overhead"""
+    return len(text) // 4 + 4
+
+
+class ConversationStore:
+    """Token-budgeted chat histories keyed by user, with LRU and idle eviction"""
+
+    def __init__(
+        self,
+        token_budget: int = Config.CONVERSATION_TOKEN_BUDGET,
+        max_sessions: int = Config.CONVERSATION_MAX_SESSIONS,
+        idle_ttl: int = Config.CONVERSATION_IDLE_TTL
+    ):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # user -> {"messages": [...], "tokens": int, "last_used": float}, least recently used first
+        self._sessions: "OrderedDict[Hashable, Dict]" = OrderedDict()
+
+    def history(self, user_id: Hashable) -> List[Dict]:
+        """The user's recent messages, oldest first"""
+        self._expire_idle()
+        session = self._sessions.get(user_id)
+        if session is None:
+            return []
+        self._sessions.move_to_end(user_id)
+        session["last_used"] = time.monotonic()
+        return list(session["messages"])
+
+    def append(self, user_id: Hashable, prompt: str, response: str) -> None:
+        """Record an exchange, then drop the oldest exchanges that no longer fit the budget"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions[user_id] = {"messages": [], "tokens": 0, "last_used": 0.0}
+        self._sessions.move_to_end(user_id)
+        session["last_used"] = time.monotonic()
+
+        session["messages"].extend([
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": response},
+        ])
+        session["tokens"] += estimate_tokens(prompt) + estimate_tokens(response)
+
+        # Trim whole exchanges so the history never starts with an orphaned answer
+        while session["tokens"] > self.token_budget and len(session["messages"]) > 2:
+            for message in session["messages"][:2]:
+                session["tokens"] -= estimate_tokens(message["content"])
+            del session["messages"][:2]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            metrics.increment("conversations.evicted")
+
+    def clear(self, user_id: Hashable) -> None:
+        """Forget one user's conversation"""
+        self._sessions.pop(user_id, None)
+
+    def clear_all(self) -> None:
+        self._sessions.clear()
+
+    def _expire_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session["last_used"] >= cutoff:
+                break
+            del self._sessions[user_id]
+            metrics.increment("conversations.expired")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import logging
 import os
 from typing import Dict, List, Tuple, Optional
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class ECForecastService:
         self.model_path = os.path.join(os.path.dirname(__file__), 'ec_forecast_model.pkl')
         self._load_model()
     
+    @metrics.timed("ec_forecast.model_load")
     def _load_model(self):
         """Load the pre-trained EC forecast model - try multiple methods"""
         try:
@@ -49,6 +51,7 @@ class ECForecastService:
         self.model = None
         raise Exception(f"Cannot load ML model - tried pickle (standard & latin1) and joblib")
     
+    @metrics.timed("ec_forecast.predict")
     def predict_90_day_forecast(self, current_ec: float, current_moisture: float) -> Dict:
         """
         Predict EC values for the next 90 days using the actual ML model
@@ -165,6 +168,7 @@ class ECForecastService:
             
         except Exception as e:
             logger.error(f"Error making EC predictions with actual model: {e}")
+            metrics.increment("ec_forecast.predict_failures")
             return {
                 'success': False,
                 'error': str(e),
@@ -174,6 +178,7 @@ class ECForecastService:
                 'dates': []
             }
     
+    @metrics.timed("ec_forecast.format")
     def format_prediction_message(self, prediction_result: Dict) -> str:
         """
         Format the prediction results into a user-friendly message
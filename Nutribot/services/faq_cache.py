@@ -0,0 +1,141 @@
+"""
+Local answer cache for recurring Ask Anything questions.
+
+Questions are normalised and turned into hashed word + character-trigram TF-IDF
+vectors with NumPy. A new question close enough (cosine similarity) to one that
+was already answered, and with the same negation, gets the stored answer back
+without an API call. Entries
+expire after a TTL and the least used ones are dropped when the cache is full.
+"""
+
+import re
+import time
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# "Should I add X" and "should I NOT add X" look alike as vectors but need opposite answers
+_NEGATION_RE = re.compile(
+    r"\b(?:not|no|never|without|cannot|avoid|\w+n['’]t|"
+    r"(?:do|does|did|is|are|was|were|should|would|could|ca|wo|have|has)nt)\b"
+)
+
+
+def normalise_question(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def question_features(text: str) -> List[str]:
+    """Words, word bigrams and character trigrams (which tolerate typos and plurals)"""
+    words = normalise_question(text).split()
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        features += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+def is_negated(text: str) -> bool:
+    """Whether a question contains a negation (not, never, don't, ...)"""
+    return bool(_NEGATION_RE.search(text.lower()))
+
+
+class FAQCache:
+    """In-process TF-IDF index of answered questions"""
+
+    def __init__(
+        self,
+        threshold: float = Config.FAQ_CACHE_THRESHOLD,
+        ttl: int = Config.FAQ_CACHE_TTL,
+        max_entries: int = Config.FAQ_CACHE_SIZE,
+        dimensions: int = 4096
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._entries: List[Dict] = []
+        self._tf = np.zeros((0, dimensions), dtype=np.float32)
+        self._df = np.zeros(dimensions, dtype=np.float32)
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        """The cached entry most similar to the question, if it clears the threshold"""
+        self._expire()
+        if not self._entries:
+            metrics.increment("faq_cache.misses")
+            return None
+
+        idf = np.log((1 + len(self._entries)) / (1 + self._df)) + 1
+        documents = self._tf * idf
+        documents /= np.linalg.norm(documents, axis=1, keepdims=True) + 1e-9
+        query = self._vector(question) * idf
+        query /= np.linalg.norm(query) + 1e-9
+
+        similarities = documents @ query
+        # A negated question never reuses the answer to its positive form, or vice versa
+        negated = is_negated(question)
+        similarities[[entry["negated"] != negated for entry in self._entries]] = -1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            metrics.increment("faq_cache.misses")
+            return None
+
+        entry = self._entries[best]
+        entry["hits"] += 1
+        metrics.increment("faq_cache.hits")
+        logger.info(f"FAQ cache hit ({similarities[best]:.2f}, {entry['hits']} hits): {entry['question'][:60]}")
+        return entry
+
+    def add(self, question: str, answer: str) -> None:
+        """Store an answer, replacing the least used entry if the cache is full"""
+        if not normalise_question(question):
+            return
+        if len(self._entries) >= self.max_entries:
+            self._remove([min(range(len(self._entries)), key=lambda i: (self._entries[i]["hits"], self._entries[i]["created"]))])
+
+        vector = self._vector(question)
+        self._entries.append({
+            "question": question,
+            "answer": answer,
+            "negated": is_negated(question),
+            "created": time.monotonic(),
+            "hits": 0
+        })
+        self._tf = np.vstack([self._tf, vector])
+        self._df += vector > 0
+
+    def _vector(self, text: str) -> np.ndarray:
+        """Sublinear term frequencies of hashed features"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in question_features(text):
+            vector[zlib.crc32(feature.encode()) % self.dimensions] += 1
+        return np.log1p(vector)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        expired = [i for i, entry in enumerate(self._entries) if entry["created"] < cutoff]
+        if expired:
+            self._remove(expired)
+
+    def _remove(self, indices: List[int]) -> None:
+        self._df -= (self._tf[indices] > 0).sum(axis=0)
+        self._tf = np.delete(self._tf, indices, axis=0)
+        for i in sorted(indices, reverse=True):
+            del self._entries[i]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global instance for easy import
+faq_cache = FAQCache()
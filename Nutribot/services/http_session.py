@@ -0,0 +1,57 @@
+"""
+Shared aiohttp session for outbound API calls (OpenAI, Synthesia, video downloads).
+
+One pooled session per event loop keeps TLS connections to each API alive between
+requests and caches DNS lookups. The bot opens it in on_startup (post_init when
+polling, app.py's startup under gunicorn) and closes it in on_shutdown. Code running
+on another loop, such as a benchmark script, gets its own session for that loop.
+"""
+
+import asyncio
+import logging
+import weakref
+
+import aiohttp
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPSessionPool:
+    """Lifecycle-managed aiohttp sessions, one per event loop"""
+
+    def __init__(self):
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Open the session for the running loop"""
+        return self.get()
+
+    def get(self) -> aiohttp.ClientSession:
+        """Session for the running loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=Config.HTTP_POOL_LIMIT,
+                limit_per_host=Config.HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=Config.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT,
+            )
+            # Timeouts stay per request - API calls and video downloads need very different ones
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+            logger.info("Opened shared HTTP session")
+        return session
+
+    async def close(self) -> None:
+        """Close the session for the running loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("Closed shared HTTP session")
+
+
+# Global instance for easy import
+http_pool = HTTPSessionPool()
@@ -2,10 +2,24 @@ import logging
 import aiohttp
 import json
 import asyncio
+import hashlib
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
 from config import Config
+from services.conversation_store import ConversationStore
+from services.http_session import http_pool
+from services.api_scheduler import api_schedulers, parse_retry_after, CallPriority, RateLimited, PRIORITY_INTERACTIVE
+from utils.single_flight import SingleFlight
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Shared by every LlamaInterface, so identical prompts from different handlers coalesce too
+_in_flight = SingleFlight("openai")
+# Scheduling priority of each in-flight request, raised when a more urgent caller joins it
+_in_flight_priorities: Dict[str, CallPriority] = {}
+
 class LlamaInterface:
     """
     Interface for interacting with OpenAI's GPT models via their API.
@@ -26,19 +40,36 @@ class LlamaInterface:
         }
         
         logger.info(f"Using OpenAI model: {self.model_name}")
-        self.history = []
+        self.conversations = ConversationStore()
 
-    def clear_memory(self):
-        """Clear the conversation history."""
-        self.history = []
+    def clear_memory(self, conversation_id: Optional[Hashable] = None):
+        """Clear one conversation's history, or every conversation if no id is given."""
+        if conversation_id is None:
+            self.conversations.clear_all()
+        else:
+            self.conversations.clear(conversation_id)
 
-    async def generate_response(self, prompt: str, max_length: int = 500) -> str:
+    async def generate_response(
+        self,
+        prompt: str,
+        max_length: int = 500,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        conversation_id: Optional[Hashable] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        caller: str = "chat"
+    ) -> str:
         """
         Generate a response from OpenAI's GPT model.
 
         Args:
             prompt: The input text prompt
             max_length: Maximum length of the generated response (max_tokens)
+            on_partial: If given, the response is streamed and this is called with
+                the text received so far after each chunk
+            conversation_id: Whose conversation this continues (e.g. the Telegram user id).
+                Without one the call is stateless: no history is sent or recorded.
+            priority: Scheduling class when requests are queued for the rate limit
+            caller: Code path tag for token and latency accounting (e.g. "ama")
 
         Returns:
             Generated response text
@@ -53,8 +84,9 @@ class LlamaInterface:
             # Build messages array with conversation history
             messages = [system_message]
             
-            # Add conversation history
-            messages.extend(self.history)
+            # Add this user's conversation history
+            if conversation_id is not None:
+                messages.extend(self.conversations.history(conversation_id))
             
             # Add current user message
             messages.append({
@@ -70,57 +102,40 @@ class LlamaInterface:
                 "temperature": Config.AI_TEMPERATURE,
                 "top_p": Config.AI_TOP_P,
                 "frequency_penalty": 0,
-                "presence_penalty": 0
+                "presence_penalty": 0,
+                "stream": on_partial is not None
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        if 'choices' in result and len(result['choices']) > 0:
-                            generated_text = result['choices'][0]['message']['content'].strip()
-                            
-                            # Add to conversation history
-                            self.history.append({
-                                "role": "user",
-                                "content": prompt
-                            })
-                            self.history.append({
-                                "role": "assistant",
-                                "content": generated_text
-                            })
-                            
-                            # Limit conversation history to prevent token overflow
-                            if len(self.history) > 10:  # Keep last 5 exchanges
-                                self.history = self.history[-10:]
-                            
-                            return generated_text
-                        else:
-                            logger.error(f"Unexpected API response format: {result}")
-                            return "Sorry, I received an unexpected response format. Please try again."
-                    
-                    elif response.status == 401:
-                        logger.error("OpenAI API authentication failed")
-                        return "Sorry, there's an authentication issue. Please check the API key configuration."
-                    
-                    elif response.status == 429:
-                        logger.error("OpenAI API rate limit exceeded")
-                        return "Sorry, I'm currently receiving too many requests. Please try again in a moment."
-                    
-                    elif response.status == 503:
-                        logger.error("OpenAI API service unavailable")
-                        return "Sorry, the AI service is temporarily unavailable. Please try again later."
+            completion = await self._post_completion(payload, Config.HTTP_TIMEOUT, on_partial, priority, caller)
+            
+            if completion["status"] == 200:
+                generated_text = completion["text"]
+                
+                if generated_text:
+                    # Add to conversation history (trimmed to the token budget)
+                    if conversation_id is not None:
+                        self.conversations.append(conversation_id, prompt, generated_text)
                     
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI API Error {response.status}: {error_text}")
-                        return "Sorry, I encountered an error while processing your request. Please try again."
+                    return generated_text
+                else:
+                    logger.error(f"Unexpected API response format: {completion['body']}")
+                    return "Sorry, I received an unexpected response format. Please try again."
+            
+            elif completion["status"] == 401:
+                logger.error("OpenAI API authentication failed")
+                return "Sorry, there's an authentication issue. Please check the API key configuration."
+            
+            elif completion["status"] == 429:
+                logger.error("OpenAI API rate limit exceeded")
+                return "Sorry, I'm currently receiving too many requests. Please try again in a moment."
+            
+            elif completion["status"] == 503:
+                logger.error("OpenAI API service unavailable")
+                return "Sorry, the AI service is temporarily unavailable. Please try again later."
+            
+            else:
+                logger.error(f"OpenAI API Error {completion['status']}: {completion['body']}")
+                return "Sorry, I encountered an error while processing your request. Please try again."
             
         except asyncio.TimeoutError:
             logger.error("Request to OpenAI API timed out")
@@ -132,7 +147,15 @@ class LlamaInterface:
             logger.error(f"Error generating response: {e}")
             return "Sorry, I encountered an error while processing your request. Please try again."
 
-    async def analyze_image_with_vision(self, base64_image: str, prompt: str, max_length: int = 500) -> str:
+    async def analyze_image_with_vision(
+        self,
+        base64_image: str,
+        prompt: str,
+        max_length: int = 500,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        caller: str = "vision"
+    ) -> str:
         """
         Analyze an image using OpenAI's Vision API (GPT-4V)
         
@@ -140,6 +163,10 @@ class LlamaInterface:
             base64_image: Base64 encoded image data
             prompt: Analysis prompt for the AI
             max_length: Maximum length of response
+            on_partial: If given, the response is streamed and this is called with
+                the text received so far after each chunk
+            priority: Scheduling class when requests are queued for the rate limit
+            caller: Code path tag for token and latency accounting
             
         Returns:
             Analysis response text
@@ -171,41 +198,192 @@ class LlamaInterface:
                 "messages": messages,
                 "max_tokens": max_length,
                 "temperature": Config.AI_TEMPERATURE,
-                "top_p": Config.AI_TOP_P
+                "top_p": Config.AI_TOP_P,
+                "stream": on_partial is not None
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT + 10)  # Extra time for vision
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        if 'choices' in result and len(result['choices']) > 0:
-                            return result['choices'][0]['message']['content'].strip()
-                        else:
-                            logger.error(f"Unexpected vision API response format: {result}")
-                            return "Sorry, I received an unexpected response format during image analysis."
-                    
-                    elif response.status == 401:
-                        logger.error("OpenAI Vision API authentication failed")
-                        return "Sorry, there's an authentication issue with the vision analysis."
-                    
-                    elif response.status == 429:
-                        logger.error("OpenAI Vision API rate limit exceeded")
-                        return "Sorry, the vision analysis service is temporarily busy. Please try again in a moment."
-                    
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI Vision API Error {response.status}: {error_text}")
-                        return "Sorry, I encountered an error during image analysis. Please try again."
-                        
+            completion = await self._post_completion(payload, Config.HTTP_TIMEOUT + 10, on_partial, priority, caller)  # Extra time for vision
+            
+            if completion["status"] == 200:
+                analysis = completion["text"]
+                
+                if analysis:
+                    return analysis
+                else:
+                    logger.error(f"Unexpected vision API response format: {completion['body']}")
+                    return "Sorry, I received an unexpected response format during image analysis."
+            
+            elif completion["status"] == 401:
+                logger.error("OpenAI Vision API authentication failed")
+                return "Sorry, there's an authentication issue with the vision analysis."
+            
+            elif completion["status"] == 429:
+                logger.error("OpenAI Vision API rate limit exceeded")
+                return "Sorry, the vision analysis service is temporarily busy. Please try again in a moment."
+            
+            else:
+                logger.error(f"OpenAI Vision API Error {completion['status']}: {completion['body']}")
+                return "Sorry, I encountered an error during image analysis. Please try again."
+                
         except asyncio.TimeoutError:
             logger.error("Vision API request timed out")
             return "Sorry, the image analysis took too long. Please try again."
         except Exception as e:
             logger.error(f"Error in vision analysis: {e}")
-            return "Sorry, I encountered an error while analyzing the image. Please try again."
\ No newline at end of file
+            return "Sorry, I encountered an error while analyzing the image. Please try again."
+
+    async def _post_completion(
+        self,
+        payload: dict,
+        timeout: float,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        caller: str = "chat"
+    ) -> dict:
+        """
+        Send a chat completion request, coalescing it with an identical one already
+        in flight. Returns {"status", "text", "body"}; text is None unless the
+        request succeeded, body is the raw response for logging.
+        """
+        if payload.get("stream"):
+            # Have the last chunk carry token usage, which streams otherwise leave out
+            payload = {**payload, "stream_options": {"include_usage": True}}
+        
+        # Streamed and non-streamed requests get the same completion, so share them
+        key = hashlib.sha256(
+            json.dumps({**payload, "stream": None, "stream_options": None}, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        # A caller joining a request that's still queued lifts it to its own priority
+        shared = _in_flight_priorities.get(key)
+        if shared is not None:
+            shared.raise_to(priority)
+        
+        def start(publish):
+            call_priority = _in_flight_priorities[key] = CallPriority(priority)
+            return self._send_shared(key, call_priority, payload, timeout, publish if on_partial else None, caller)
+        
+        # Streamed text goes to every caller waiting on this request, not just the first
+        return await _in_flight.run(key, start, on_progress=on_partial)
+    
+    async def _send_shared(
+        self,
+        key: str,
+        priority: CallPriority,
+        payload: dict,
+        timeout: float,
+        on_partial: Optional[Callable[[str], Awaitable[None]]],
+        caller: str
+    ) -> dict:
+        """Send the request for a coalesced key, forgetting its shared priority once done"""
+        try:
+            return await self._send_completion(payload, timeout, on_partial, priority, caller)
+        finally:
+            if _in_flight_priorities.get(key) is priority:
+                del _in_flight_priorities[key]
+
+    async def _send_completion(
+        self,
+        payload: dict,
+        timeout: float,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        priority: Union[int, CallPriority] = PRIORITY_INTERACTIVE,
+        caller: str = "chat"
+    ) -> dict:
+        """Make the upstream chat completion request within the OpenAI rate limit"""
+        try:
+            return await api_schedulers["openai"].call(
+                lambda: self._request_completion(payload, timeout, on_partial, caller), priority
+            )
+        except RateLimited as e:
+            return {"status": 429, "text": None, "body": e.body}
+
+    async def _request_completion(
+        self,
+        payload: dict,
+        timeout: float,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        caller: str = "chat"
+    ) -> dict:
+        start = time.perf_counter()
+        status, usage = None, None
+        session = http_pool.get()
+        try:
+            async with session.post(
+                self.api_url,
+                headers=self.headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                status = response.status
+                if response.status == 429:
+                    raise RateLimited(parse_retry_after(response.headers), await response.text())
+                if response.status != 200:
+                    return {"status": response.status, "text": None, "body": await response.text()}
+                if on_partial:
+                    text, usage = await self._read_stream(response, on_partial)
+                    return {"status": 200, "text": text or None, "body": "<stream>"}
+                result = await response.json()
+                usage = result.get("usage")
+                return {"status": 200, "text": self._extract_content(result), "body": result}
+        except Exception:
+            status = status or "error"
+            raise
+        finally:
+            self._record_usage(caller, payload["model"], status, time.perf_counter() - start, usage)
+
+    @staticmethod
+    def _record_usage(caller: str, model: str, status, elapsed: float, usage: Optional[dict]) -> None:
+        """Latency, request and token counters per code path and model"""
+        metrics.observe(f"llm.latency.{caller}", elapsed)
+        metrics.increment(f"llm.requests.{caller}.{status}")
+        if not usage:
+            return
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        metrics.increment(f"llm.tokens.prompt.{caller}", prompt_tokens)
+        metrics.increment(f"llm.tokens.completion.{caller}", completion_tokens)
+        metrics.increment(f"llm.tokens.model.{model}", prompt_tokens + completion_tokens)
+        metrics.increment(f"llm.tokens.day.{date.today().isoformat()}", prompt_tokens + completion_tokens)
+
+    @staticmethod
+    def _extract_content(result: dict) -> Optional[str]:
+        """Message text from a non-streamed chat completion, or None if it's missing"""
+        if 'choices' in result and len(result['choices']) > 0:
+            return result['choices'][0]['message']['content'].strip()
+        return None
+
+    @staticmethod
+    async def _read_stream(
+        response: aiohttp.ClientResponse,
+        on_partial: Callable[[str], Awaitable[None]]
+    ) -> Tuple[str, Optional[dict]]:
+        """
+        Read a streamed chat completion (server-sent events), passing the text
+        received so far to on_partial after each content chunk. Returns the
+        text and the token usage from the final chunk, if the API sent it.
+        """
+        parts = []
+        usage = None
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            
+            chunk = json.loads(data)
+            usage = chunk.get("usage") or usage
+            choices = chunk.get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            
+            try:
+                await on_partial("".join(parts))
+            except Exception as e:
+                # A failed progress update shouldn't cost us the response
+                logger.warning(f"Partial response delivery failed: {e}")
+        
+        return "".join(parts).strip(), usage
@@ -0,0 +1,120 @@
+"""
+On-CPU image classifier used as a first pass or fallback for Clarifai.
+
+One TorchScript model per scan type is loaded from LOCAL_CLASSIFIER_DIR
+(`compost.pt` / `plant.pt`, each with a `<name>.labels.json` list of class names)
+once and run in a small worker pool so inference never blocks the event loop.
+Dynamic quantisation can't be applied to a loaded ScriptModule, so for int8
+inference quantise the model (e.g. torch.ao.quantization.quantize_dynamic) before
+scripting it. Predictions use the same {"name", "value"} shape as Clarifai concepts.
+"""
+
+import io
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ImageNet normalisation, which small pretrained CNN backbones expect
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def preprocess_image(image_bytes: bytes, size: int = Config.LOCAL_CLASSIFIER_INPUT_SIZE) -> np.ndarray:
+    """Resize, centre-crop and normalise an image into a (1, 3, size, size) float32 batch"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image = ImageOps.fit(image, (size, size), Image.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+    pixels = (pixels - _MEAN) / _STD
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1)[None])
+
+
+class LocalImageClassifier:
+    """Lazily loaded TorchScript classifiers shared across scans"""
+
+    MODEL_TYPES = ("compost", "plant")
+
+    def __init__(self, model_dir: str = Config.LOCAL_CLASSIFIER_DIR, workers: int = Config.LOCAL_CLASSIFIER_WORKERS):
+        self.model_dir = model_dir
+        self._models: Dict[str, object] = {}
+        self._labels: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-classifier")
+
+    def is_available(self, model_type: str) -> bool:
+        """Whether a model file exists for this scan type"""
+        return os.path.exists(self._model_path(model_type))
+
+    def _model_path(self, model_type: str) -> str:
+        return os.path.join(self.model_dir, f"{model_type}.pt")
+
+    def _load(self, model_type: str):
+        """Load and cache the model for a scan type (once per process)"""
+        model = self._models.get(model_type)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if model_type in self._models:
+                return self._models[model_type]
+            if model_type not in self.MODEL_TYPES:
+                raise ValueError(f"Unknown model type: {model_type}")
+
+            import torch  # Heavy import, only paid when the local classifier is actually used
+
+            start = time.perf_counter()
+            model = torch.jit.load(self._model_path(model_type), map_location="cpu").eval()
+
+            with open(os.path.join(self.model_dir, f"{model_type}.labels.json")) as labels_file:
+                self._labels[model_type] = json.load(labels_file)
+            self._models[model_type] = model
+
+            elapsed = time.perf_counter() - start
+            metrics.observe(f"local_classifier.load.{model_type}", elapsed)
+            logger.info(f"Local {model_type} classifier loaded in {elapsed:.2f}s")
+            return model
+
+    def get_top_concepts(self, model_type: str, image_bytes: bytes, top_n: int = 5) -> List[Dict]:
+        """Blocking prediction; returns the top_n classes with their probabilities"""
+        import torch
+
+        model = self._load(model_type)
+        batch = torch.from_numpy(preprocess_image(image_bytes))
+
+        with metrics.timer(f"local_classifier.predict.{model_type}"), torch.inference_mode():
+            probabilities = torch.softmax(model(batch)[0], dim=0).numpy()
+
+        labels = self._labels[model_type]
+        top = np.argsort(probabilities)[::-1][:top_n]
+        return [{"name": labels[i], "value": float(probabilities[i]), "source": "local"} for i in top]
+
+    async def top_concepts(self, model_type: str, image_bytes: bytes, top_n: int = 5) -> List[Dict]:
+        """Run a prediction on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.get_top_concepts, model_type, image_bytes, top_n)
+
+    def warm_up(self) -> None:
+        """Load every available model up front so the first scan doesn't pay for it"""
+        for model_type in self.MODEL_TYPES:
+            if self.is_available(model_type):
+                try:
+                    self._load(model_type)
+                except Exception as e:
+                    logger.error(f"Could not load local {model_type} classifier: {e}")
+
+
+# Global instance for easy import
+local_classifier = LocalImageClassifier()
@@ -3,13 +3,67 @@ import numpy as np
 import pandas as pd
 import pickle
 import os
-from typing import Dict, List, Tuple
-from datetime import datetime, timedelta
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 from services.database import db
+from utils.metrics import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Moisture status levels, indexed by the status codes stored in projection snapshots
+STATUS_CRITICAL, STATUS_LOW, STATUS_MODERATE, STATUS_GOOD = range(4)
+STATUS_LEVELS = ("critical", "low", "moderate", "good")
+STATUS_THRESHOLDS = np.array([20, 40, 60], dtype=np.float32)  # Lower bounds of low, moderate, good
+STATUS_RECOMMENDATIONS = (
+    "🚨 Critical - Water immediately",
+    "⚠️ Low - Water soon",
+    "📊 Moderate - Monitor",
+    "✅ Good - No action needed",
+)
+STATUS_EMOJI = ("🚨", "⚠️", "📊", "✅")
+
+# Fallback decay model used while a user has too little history for the lagged model
+FALLBACK_SEED = 42
+FALLBACK_DAILY_LOSS = (2.5, 4.5)  # % moisture lost per day
+FALLBACK_DRYING_RATE_BOUNDS = (0.5, 10.0)  # Clamp for drying rates estimated from user history
+
+
+@lru_cache(maxsize=8)
+def _fallback_loss_profile(days: int) -> np.ndarray:
+    """Seeded daily moisture loss profile shared by every fallback projection"""
+    rng = np.random.default_rng(FALLBACK_SEED)
+    profile = rng.uniform(*FALLBACK_DAILY_LOSS, size=days)
+    profile.flags.writeable = False
+    return profile
+
+
+def fallback_moisture_curve(current_moisture: float, drying_rate: Optional[float] = None, days: int = 30) -> np.ndarray:
+    """
+    Fallback decay model for one user, computed for every day at once.
+    
+    Args:
+        current_moisture: Current moisture percentage
+        drying_rate: Optional average % lost per day from the user's history.
+            The seeded loss profile is rescaled so its mean matches it.
+        days: Number of days to project
+    
+    Returns:
+        Array of shape (days,) with moisture percentages rounded to 0.1
+    """
+    loss = _fallback_loss_profile(days)
+    scale = 1.0 if drying_rate is None else drying_rate / loss.mean()
+    curve = current_moisture - scale * np.cumsum(loss)
+    return np.round(np.clip(curve, 0, 100), 1)
+
+
+@lru_cache(maxsize=1024)
+def _cached_fallback_curve(current_moisture: float, drying_rate: Optional[float], days: int = 30) -> Tuple[float, ...]:
+    """Cached fallback curve (inputs are rounded by the caller)"""
+    return tuple(fallback_moisture_curve(current_moisture, drying_rate, days).tolist())
+
 class PlantMoistureProjection:
     """Service to handle plant moisture projection and watering recommendations"""
     
@@ -18,6 +72,7 @@ class PlantMoistureProjection:
         self.feature_names = None
         self.load_lagged_model()
     
+    @metrics.timed("plant_moisture.model_load")
     def load_lagged_model(self):
         """Load the lagged XGBoost model and feature names"""
         try:
@@ -80,76 +135,157 @@ class PlantMoistureProjection:
         """
         Generate moisture projection for the next 30 days using lagged XGBoost model
         """
+        snapshot = self.build_projection_snapshot(current_moisture, telegram_id)
+        
+        return {
+            "current_moisture": current_moisture,
+            "projections": self._expand_snapshot(snapshot),
+            "overall_recommendation": self._get_overall_recommendation(snapshot),
+            "next_watering_day": self._get_next_watering_day(snapshot),
+            "watering_alerts": self._get_watering_alerts(snapshot)
+        }
+    
+    def build_projection_snapshot(self, current_moisture: float, telegram_id: int) -> Dict:
+        """
+        Log a new reading and build a compact 30-day projection snapshot.
+        
+        The snapshot holds day 0 (today's reading) plus 30 predicted days as a
+        float32 moisture array and a uint8 status code array indexing STATUS_LEVELS,
+        so it can be stored per user and re-rendered without re-running the model.
+        """
         # Log the current moisture reading
         try:
-            db.create_plant_moisture_log(telegram_id, current_moisture)
+            with metrics.timer("plant_moisture.db_write"):
+                db.create_plant_moisture_log(telegram_id, current_moisture)
         except Exception as e:
             logger.error(f"Failed to log moisture data: {e}")
         
-        projections = []
-        current_date = datetime.now()
-        
-        # Try to use lagged XGBoost model first
-        if self.xgb_model is not None and self.feature_names is not None:
-            logger.info("Using lagged XGBoost model for predictions")
-            raw_predictions = self.predict_next_30_days(telegram_id, current_moisture)
-            
-            # Add today's reading as day 0
-            projections.append({
-                "date": current_date.strftime("%Y-%m-%d"),
-                "day_name": current_date.strftime("%A"),
-                "moisture_percentage": round(current_moisture, 1),
-                "recommendation": self._get_status_and_recommendation(current_moisture)[1],
-                "status": self._get_status_and_recommendation(current_moisture)[0]
-            })
-            
-            # Transform XGBoost predictions to existing format
-            for pred in raw_predictions:
-                pred_date = datetime.strptime(pred['date'], '%Y-%m-%d')
-                status, recommendation = self._get_status_and_recommendation(pred['moisture'])
-                
-                projections.append({
-                    "date": pred['date'],
-                    "day_name": pred_date.strftime("%A"),
-                    "moisture_percentage": pred['moisture'],
-                    "recommendation": recommendation,
-                    "status": status
-                })
-        
-        else:
+        if self.xgb_model is None or self.feature_names is None:
             # XGBoost model failed to load - return error
             logger.error("XGBoost model not available - cannot generate predictions")
             raise ValueError("Moisture prediction model not available")
         
+        logger.info("Using lagged XGBoost model for predictions")
+        raw_predictions = self.predict_next_30_days(telegram_id, current_moisture)
+        
+        moisture = np.empty(len(raw_predictions) + 1, dtype=np.float32)
+        moisture[0] = round(current_moisture, 1)
+        moisture[1:] = [pred['moisture'] for pred in raw_predictions]
+        
         return {
             "current_moisture": current_moisture,
-            "projections": projections,
-            "overall_recommendation": self._get_overall_recommendation(projections),
-            "next_watering_day": self._get_next_watering_day(projections),
-            "watering_alerts": self._get_watering_alerts(projections)
+            "start_date": datetime.now().strftime("%Y-%m-%d"),
+            "moisture": moisture,
+            "status": self._status_codes(moisture)
+        }
+    
+    @staticmethod
+    def snapshot_as_of(snapshot: Dict, day: Optional[date] = None) -> Optional[Dict]:
+        """
+        The snapshot re-based to start on the given day (default today), so an older
+        projection isn't shown as current. None once its 30 days have run out.
+        """
+        start = datetime.strptime(snapshot["start_date"], "%Y-%m-%d").date()
+        offset = ((day or date.today()) - start).days
+        if offset <= 0:
+            return snapshot
+        if offset >= len(snapshot["moisture"]):
+            return None
+        
+        return {
+            **snapshot,
+            "current_moisture": round(float(snapshot["moisture"][offset]), 1),
+            "start_date": (start + timedelta(days=offset)).strftime("%Y-%m-%d"),
+            "moisture": snapshot["moisture"][offset:],
+            "status": snapshot["status"][offset:],
+            "reading": snapshot.get("reading", snapshot["current_moisture"]),
+            "reading_date": snapshot.get("reading_date", snapshot["start_date"]),
         }
     
+    @classmethod
+    @metrics.timed("plant_moisture.format")
+    def format_projection_message(cls, snapshot: Dict) -> str:
+        """Render the plant moisture dashboard message from a projection snapshot"""
+        current_moisture = snapshot["current_moisture"]
+        
+        dashboard_text = f"💧 **Plant Moisture Dashboard**\n\n"
+        dashboard_text += f"📊 **Current Status:**\n"
+        if "reading_date" in snapshot:
+            dashboard_text += f"• Last reading on {snapshot['reading_date']}: {snapshot['reading']}%\n"
+            dashboard_text += f"• Projected moisture today: {current_moisture}%\n"
+        else:
+            dashboard_text += f"• Current moisture: {current_moisture}%\n"
+        dashboard_text += f"• {cls._get_next_watering_day(snapshot)}\n\n"
+        
+        # Show watering alerts if any
+        alerts = cls._get_watering_alerts(snapshot)
+        if alerts:
+            dashboard_text += f"🚨 **Watering Alerts (Next 30 Days):**\n"
+            for alert in alerts[:3]:  # Show first 3 alerts
+                dashboard_text += f"• {alert['message']}\n"
+            dashboard_text += "\n"
+        
+        dashboard_text += f"📅 **Next 7 Days Projection:**\n"
+        start_date = datetime.strptime(snapshot["start_date"], "%Y-%m-%d")
+        for day in range(min(7, len(snapshot["moisture"]))):
+            emoji = STATUS_EMOJI[snapshot["status"][day]]
+            day_name = (start_date + timedelta(days=day)).strftime("%A")
+            dashboard_text += f"{emoji} {day_name}: {round(float(snapshot['moisture'][day]), 1)}%\n"
+        
+        dashboard_text += f"\n🎯 **30-Day Recommendation:**\n"
+        dashboard_text += f"{cls._get_overall_recommendation(snapshot)}\n\n"
+        
+        # Add care tips
+        tips = cls.get_moisture_tips(current_moisture)
+        dashboard_text += f"💡 **Care Tips:**\n{tips}"
+        
+        return dashboard_text
     
-    def _get_watering_alerts(self, projections: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _expand_snapshot(snapshot: Dict) -> List[Dict]:
+        """Expand a projection snapshot into the per-day projection dicts"""
+        start_date = datetime.strptime(snapshot["start_date"], "%Y-%m-%d")
+        projections = []
+        
+        for day, (moisture, code) in enumerate(zip(snapshot["moisture"], snapshot["status"])):
+            day_date = start_date + timedelta(days=day)
+            projections.append({
+                "date": day_date.strftime("%Y-%m-%d"),
+                "day_name": day_date.strftime("%A"),
+                "moisture_percentage": round(float(moisture), 1),
+                "recommendation": STATUS_RECOMMENDATIONS[code],
+                "status": STATUS_LEVELS[code]
+            })
+        
+        return projections
+    
+    @staticmethod
+    def _get_watering_alerts(snapshot: Dict) -> List[Dict]:
         """Generate specific watering alerts when moisture drops below 40%"""
         alerts = []
+        start_date = datetime.strptime(snapshot["start_date"], "%Y-%m-%d")
         
-        for projection in projections:
-            if projection["moisture_percentage"] < 40 and projection["status"] in ["critical", "low"]:
-                alerts.append({
-                    "date": projection["date"],
-                    "day_name": projection["day_name"],
-                    "moisture_level": projection["moisture_percentage"],
-                    "urgency": projection["status"],
-                    "message": f"🚨 Water needed on {projection['day_name']} - Moisture will be {projection['moisture_percentage']}%"
-                })
+        # critical and low are status codes 0 and 1, both below 40%
+        alert_days = np.flatnonzero(snapshot["status"] <= STATUS_LOW)[:5]  # Return first 5 alerts to avoid spam
+        for day in alert_days:
+            day_date = start_date + timedelta(days=int(day))
+            moisture = round(float(snapshot["moisture"][day]), 1)
+            alerts.append({
+                "date": day_date.strftime("%Y-%m-%d"),
+                "day_name": day_date.strftime("%A"),
+                "moisture_level": moisture,
+                "urgency": STATUS_LEVELS[snapshot["status"][day]],
+                "message": f"🚨 Water needed on {day_date.strftime('%A')} - Moisture will be {moisture}%"
+            })
         
-        return alerts[:5]  # Return first 5 alerts to avoid spam
+        return alerts
     
-    def _get_overall_recommendation(self, projections: List[Dict]) -> str:
+    @staticmethod
+    def _get_overall_recommendation(snapshot: Dict) -> str:
         """Generate overall watering recommendation based on projections"""
-        critical_days = sum(1 for p in projections if p["status"] == "critical")
-        low_days = sum(1 for p in projections if p["status"] == "low")
+        counts = np.bincount(snapshot["status"], minlength=len(STATUS_LEVELS))
+        critical_days = counts[STATUS_CRITICAL]
+        low_days = counts[STATUS_LOW]
         
         if critical_days > 0:
             return "🚨 **Immediate Action Required**: Your plant will need water within the next few days."
@@ -158,15 +294,19 @@ class PlantMoistureProjection:
         else:
             return "✅ **All Good**: Your plant's moisture levels look healthy for the week ahead."
     
-    def _get_next_watering_day(self, projections: List[Dict]) -> str:
+    @staticmethod
+    def _get_next_watering_day(snapshot: Dict) -> str:
         """Determine the recommended next watering day"""
-        for projection in projections:
-            if projection["status"] in ["critical", "low"]:
-                return f"Next watering recommended: **{projection['day_name']}** ({projection['date']})"
+        alert_days = np.flatnonzero(snapshot["status"] <= STATUS_LOW)
+        if alert_days.size:
+            start_date = datetime.strptime(snapshot["start_date"], "%Y-%m-%d")
+            day_date = start_date + timedelta(days=int(alert_days[0]))
+            return f"Next watering recommended: **{day_date.strftime('%A')}** ({day_date.strftime('%Y-%m-%d')})"
         
         return "No immediate watering needed this week"
     
-    def get_moisture_tips(self, current_moisture: float) -> str:
+    @staticmethod
+    def get_moisture_tips(current_moisture: float) -> str:
         """Get tips based on current moisture level"""
         if current_moisture < 20:
             return (
@@ -299,11 +439,13 @@ class PlantMoistureProjection:
         """
         try:
             # Get historical data (last 4 days minimum)
-            historical_data = self._get_historical_moisture_data(telegram_id, days=4)
+            with metrics.timer("plant_moisture.history_fetch"):
+                historical_data = self._get_historical_moisture_data(telegram_id, days=4)
             
             if len(historical_data) < 4:
                 logger.warning(f"Insufficient historical data ({len(historical_data)} days), using fallback")
-                return self._fallback_predictions(current_moisture)
+                metrics.increment("plant_moisture.fallback")
+                return self._fallback_predictions(current_moisture, self._estimate_drying_rate(historical_data))
             
             # Add current reading to historical data
             today_data = {
@@ -316,11 +458,13 @@ class PlantMoistureProjection:
             full_data = pd.concat([historical_data, pd.DataFrame([today_data])], ignore_index=True)
             
             # Create features for prediction
-            X_features, _ = self.create_features(full_data, lag_days=3)
-            current_features = X_features.iloc[-1].values.copy()
+            with metrics.timer("plant_moisture.feature_build"):
+                X_features, _ = self.create_features(full_data, lag_days=3)
+                current_features = X_features.iloc[-1].values.copy()
             
             # Generate 30-day rolling predictions
             predictions = []
+            predict_start = time.perf_counter()
             
             for day in range(30):
                 # Make prediction for this day
@@ -343,37 +487,57 @@ class PlantMoistureProjection:
                 # Increment days since water (assuming no watering)
                 current_features[-1] += 1
             
+            metrics.observe("plant_moisture.predict", time.perf_counter() - predict_start)
             return predictions
             
         except Exception as e:
             logger.error(f"Error in lagged prediction: {e}")
+            metrics.increment("plant_moisture.fallback")
             return self._fallback_predictions(current_moisture)
     
-    def _fallback_predictions(self, current_moisture: float) -> List[Dict]:
-        """Generate fallback predictions using simple decay model"""
-        predictions = []
-        moisture = current_moisture
+    def _fallback_predictions(self, current_moisture: float, drying_rate: Optional[float] = None) -> List[Dict]:
+        """Generate fallback predictions using the seeded decay model"""
+        if drying_rate is not None:
+            drying_rate = round(drying_rate, 2)
+        curve = _cached_fallback_curve(round(current_moisture, 1), drying_rate)
         
-        for day in range(30):
-            # Simple decay model
-            daily_loss = random.uniform(2.5, 4.5)
-            moisture = max(0, moisture - daily_loss)
-            
+        predictions = []
+        for day, moisture in enumerate(curve):
             predictions.append({
                 'day': day + 1,
-                'moisture': round(moisture, 1),
+                'moisture': moisture,
                 'date': (datetime.now() + timedelta(days=day + 1)).strftime('%Y-%m-%d')
             })
         
         return predictions
     
+    def _estimate_drying_rate(self, historical_data: pd.DataFrame) -> Optional[float]:
+        """
+        Estimate how fast a user's plant dries out (% per day) from their past readings.
+        Only drops between readings at least half a day apart are counted, so watering
+        events and repeated readings do not skew the rate.
+        """
+        if len(historical_data) < 2:
+            return None
+        
+        try:
+            data = historical_data.sort_values('date')
+            elapsed_days = pd.to_datetime(data['date']).diff().dt.total_seconds() / 86400
+            drops = -data['moisture'].astype(float).diff()
+            rates = (drops / elapsed_days)[(elapsed_days >= 0.5) & (drops > 0)]
+            if rates.empty:
+                return None
+            return float(np.clip(rates.median(), *FALLBACK_DRYING_RATE_BOUNDS))
+        except Exception as e:
+            logger.error(f"Error estimating drying rate: {e}")
+            return None
+    
     def _get_status_and_recommendation(self, moisture: float) -> Tuple[str, str]:
         """Get status and recommendation for a moisture level"""
-        if moisture < 20:
-            return "critical", "🚨 Critical - Water immediately"
-        elif moisture < 40:
-            return "low", "⚠️ Low - Water soon"
-        elif moisture < 60:
-            return "moderate", "📊 Moderate - Monitor"
-        else:
-            return "good", "✅ Good - No action needed"
\ No newline at end of file
+        code = int(self._status_codes(np.asarray([moisture]))[0])
+        return STATUS_LEVELS[code], STATUS_RECOMMENDATIONS[code]
+    
+    @staticmethod
+    def _status_codes(moisture: np.ndarray) -> np.ndarray:
+        """Map moisture values to status codes (index into STATUS_LEVELS)"""
+        return np.searchsorted(STATUS_THRESHOLDS, moisture, side='right').astype(np.uint8)
@@ -0,0 +1,161 @@
+"""
+Result caches for repeated image scans.
+
+ScanResultCache keys whole scan results by scan type plus either the Telegram
+file_unique_id (exact resend) or a 64-bit perceptual hash of the image
+(near-identical photo). InterpretationCache keys the LLM interpretation of Clarifai
+output by scan type plus the quantised concept set, which repeats across users.
+Both use LRU eviction.
+"""
+
+import io
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis matrix"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def perceptual_hash(image_bytes: bytes) -> int:
+    """
+    64-bit pHash: low-frequency DCT coefficients of a 32x32 greyscale thumbnail,
+    thresholded at their median. Near-identical photos differ in only a few bits.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = np.asarray(image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+    coefficients = (_DCT @ pixels @ _DCT.T)[:_HASH_SIZE, :_HASH_SIZE]
+    bits = (coefficients > np.median(coefficients)).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class ScanResultCache:
+    """Size-bounded LRU cache of scan analysis results"""
+
+    def __init__(self, max_size: int = Config.SCAN_CACHE_SIZE, max_distance: int = Config.SCAN_CACHE_HASH_DISTANCE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        # (scan_type, phash) -> result, oldest first
+        self._entries: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+        # (scan_type, file_unique_id) -> phash of the entry it points at
+        self._file_ids: Dict[Tuple[str, str], int] = {}
+
+    def get_by_file_id(self, scan_type: str, file_unique_id: Optional[str]) -> Optional[Dict]:
+        """Look up an exact resend of a Telegram file"""
+        if not file_unique_id:
+            return None
+        image_hash = self._file_ids.get((scan_type, file_unique_id))
+        if image_hash is None:
+            return None
+        return self._hit((scan_type, image_hash))
+
+    def get_by_hash(self, scan_type: str, image_hash: int) -> Optional[Dict]:
+        """Look up the closest cached image within max_distance bits"""
+        key = (scan_type, image_hash)
+        if key in self._entries:
+            return self._hit(key)
+
+        best_key, best_distance = None, self.max_distance + 1
+        for cached_type, cached_hash in self._entries:
+            if cached_type != scan_type:
+                continue
+            distance = hamming_distance(image_hash, cached_hash)
+            if distance < best_distance:
+                best_key, best_distance = (cached_type, cached_hash), distance
+        if best_key is None:
+            metrics.increment("scan_cache.misses")
+            return None
+        return self._hit(best_key)
+
+    def put(self, scan_type: str, image_hash: int, result: Dict, file_unique_id: Optional[str] = None) -> None:
+        """Store a result, evicting the least recently used entries beyond max_size"""
+        key = (scan_type, image_hash)
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        if file_unique_id:
+            self._file_ids[(scan_type, file_unique_id)] = image_hash
+
+        while len(self._entries) > self.max_size:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._file_ids = {k: v for k, v in self._file_ids.items() if (k[0], v) != evicted_key}
+            metrics.increment("scan_cache.evictions")
+
+    def _hit(self, key: Tuple[str, int]) -> Optional[Dict]:
+        result = self._entries.get(key)
+        if result is None:
+            return None
+        self._entries.move_to_end(key)
+        metrics.increment("scan_cache.hits")
+        return dict(result, cached=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def concept_signature(concepts: List[Dict], step: float = Config.INTERPRETATION_CACHE_STEP) -> Tuple[Tuple[str, int], ...]:
+    """Concept names with confidences rounded to `step`, independent of order"""
+    return tuple(sorted((c["name"].lower(), int(round(c["value"] / step))) for c in concepts))
+
+
+class InterpretationCache:
+    """Size-bounded LRU cache of interpretations keyed by scan type and concept signature"""
+
+    def __init__(self, max_size: int = Config.INTERPRETATION_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, Tuple], str]" = OrderedDict()
+
+    def get(self, scan_type: str, concepts: List[Dict]) -> Optional[str]:
+        key = (scan_type, concept_signature(concepts))
+        interpretation = self._entries.get(key)
+        if interpretation is None:
+            self.misses += 1
+            metrics.increment("interpretation_cache.misses")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.increment("interpretation_cache.hits")
+        logger.info(f"Interpretation cache hit for {scan_type} (hit rate {self.hit_rate:.0%})")
+        return interpretation
+
+    def put(self, scan_type: str, concepts: List[Dict], interpretation: str) -> None:
+        key = (scan_type, concept_signature(concepts))
+        self._entries[key] = interpretation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            metrics.increment("interpretation_cache.evictions")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -2,9 +2,25 @@
 
 import logging
 import io
+import os
+import time
+import asyncio
+import weakref
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from collections import OrderedDict
+from typing import Optional, Tuple
 from dotenv import load_dotenv
+import httpx
+import numpy as np
 import openai
+import soundfile as sf
+from scipy.signal import resample_poly
 from config import Config
+from services.api_scheduler import api_schedulers, parse_retry_after, RateLimited, PRIORITY_INTERACTIVE
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -12,13 +28,149 @@ load_dotenv()
 # Set up OpenAI client
 openai.api_key = Config.OPENAI_API_KEY
 
-async def transcribe_audio_memory(audio_buffer: io.BytesIO) -> str:
+
+class TranscriptionClientPool:
+    """
+    Shared AsyncOpenAI clients, one per event loop, each with a cap on concurrent uploads.
+    
+    Reusing the client keeps its HTTP connections to OpenAI alive between voice
+    messages. SDK retries are off: 429s are retried by the OpenAI rate scheduler and
+    connection errors / 5xx by RemoteWhisperBackend, both behind a fresh rate token.
+    """
+    
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[openai.AsyncOpenAI, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+    
+    def get(self) -> Tuple[openai.AsyncOpenAI, asyncio.Semaphore]:
+        """Client and concurrency limit for the running loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            client = openai.AsyncOpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                base_url=Config.OPENAI_BASE_URL,
+                timeout=httpx.Timeout(Config.TRANSCRIPTION_TIMEOUT, connect=10),
+                max_retries=0
+            )
+            entry = self._clients[loop] = (client, asyncio.Semaphore(Config.TRANSCRIPTION_MAX_CONCURRENT))
+        return entry
+    
+    async def close(self) -> None:
+        """Close the client for the running loop"""
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].close()
+
+
+# Global instance for easy import
+transcription_clients = TranscriptionClientPool()
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int, frame_seconds: float = 0.02) -> np.ndarray:
+    """Drop leading and trailing silence from (frames, channels) audio, keeping a little padding"""
+    frame = max(1, int(sample_rate * frame_seconds))
+    frames = len(audio) // frame
+    if frames == 0:
+        return audio
+    
+    rms = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame, -1) ** 2, axis=(1, 2)))
+    level = 20 * np.log10(rms + 1e-10)
+    voiced = np.flatnonzero(level > max(level.max() - Config.AUDIO_SILENCE_THRESHOLD_DB, Config.AUDIO_SILENCE_FLOOR_DB))
+    if not voiced.size:
+        return audio[:0]
+    
+    padding = int(Config.AUDIO_SILENCE_PADDING * sample_rate)
+    start = max(voiced[0] * frame - padding, 0)
+    end = min((voiced[-1] + 1) * frame + padding, len(audio))
+    return audio[start:end]
+
+
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
     """
-    Speech-to-Text using OpenAI Whisper API directly from memory buffer
+    Decode a voice note into float32 (frames, channels) samples at AUDIO_SAMPLE_RATE,
+    downmixed to AUDIO_CHANNELS with leading and trailing silence trimmed
+    """
+    audio, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=True)
+    
+    if audio.shape[1] > Config.AUDIO_CHANNELS:
+        audio = audio.mean(axis=1, keepdims=True)
+    
+    audio = trim_silence(audio, sample_rate)
+    
+    target_rate = Config.AUDIO_SAMPLE_RATE
+    if len(audio) and sample_rate != target_rate:
+        factor = gcd(sample_rate, target_rate)
+        audio = resample_poly(audio, target_rate // factor, sample_rate // factor, axis=0).astype(np.float32)
+    return audio
+
+
+def preprocess_audio(audio_bytes: bytes) -> bytes:
     """
+    Decode, trim and resample a voice note (see decode_audio) and re-encode it as
+    Ogg Vorbis. Returns b"" for a silent clip.
+    """
+    audio = decode_audio(audio_bytes)
+    if not len(audio):
+        return b""
+    
+    # Vorbis at low quality is plenty for speech and encodes several times faster than Opus
+    output = io.BytesIO()
+    sf.write(output, audio, Config.AUDIO_SAMPLE_RATE, format="OGG", subtype="VORBIS", compression_level=0.9)
+    return output.getvalue()
+
+
+def prepare_audio_buffer(audio_buffer: io.BytesIO) -> io.BytesIO:
+    """
+    The preprocessed upload for a voice note, or the original if it can't be decoded
+    or preprocessing doesn't make it smaller
+    """
+    original = audio_buffer.getvalue()
+    start = time.perf_counter()
     try:
-        # Reset buffer position
-        audio_buffer.seek(0)
+        processed = preprocess_audio(original)
+    except Exception as e:
+        logger.warning(f"Audio preprocessing failed, uploading the original: {e}")
+        return audio_buffer
+    finally:
+        metrics.observe("transcription.preprocess", time.perf_counter() - start)
+    
+    if processed and len(processed) >= len(original):
+        return audio_buffer
+    metrics.increment("transcription.bytes_saved", len(original) - len(processed))
+    logger.info(f"Preprocessed audio {len(original)} -> {len(processed)} bytes")
+    return io.BytesIO(processed)
+
+
+class SpeechToTextBackend(ABC):
+    """Interface every transcription engine implements"""
+    
+    name = "base"
+    
+    def is_available(self) -> bool:
+        return True
+    
+    def warm_up(self) -> None:
+        """Load anything slow up front so the first voice message doesn't pay for it"""
+    
+    @abstractmethod
+    async def transcribe(self, audio_bytes: bytes) -> str:
+        """Text spoken in an encoded voice note, or "" if nothing was recognised"""
+
+
+class RemoteWhisperBackend(SpeechToTextBackend):
+    """OpenAI whisper-1 over the shared AsyncOpenAI client"""
+    
+    name = "remote"
+    
+    async def transcribe(self, audio_bytes: bytes) -> str:
+        audio_buffer = io.BytesIO(audio_bytes)
+        
+        # Decoding and re-encoding is CPU work - keep it off the event loop
+        if Config.AUDIO_PREPROCESSING:
+            audio_buffer = await asyncio.to_thread(prepare_audio_buffer, audio_buffer)
+            if not audio_buffer.getvalue():
+                logger.info("Voice message is silent, skipping transcription")
+                return ""
         
         # Check buffer size (OpenAI has 25MB limit)
         buffer_size = len(audio_buffer.getvalue())
@@ -28,33 +180,179 @@ async def transcribe_audio_memory(audio_buffer: io.BytesIO) -> str:
 
         logger.info(f"🎯 Transcribing audio with OpenAI Whisper ({buffer_size} bytes)...")
         
-        # Reset position before reading
-        audio_buffer.seek(0)
-        
         # Set a filename for the buffer (OpenAI needs this for format detection)
         audio_buffer.name = "voice_message.ogg"
         
-        # Create OpenAI client and transcribe
-        client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+        client, limit = transcription_clients.get()
+        
+        async def request():
+            try:
+                async with limit:
+                    audio_buffer.seek(0)
+                    return await client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_buffer,
+                        response_format="text"
+                    )
+            except openai.RateLimitError as e:
+                raise RateLimited(parse_retry_after(e.response.headers), e.message)
         
-        response = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_buffer,
-            response_format="text"
-        )
+        for attempt in range(Config.TRANSCRIPTION_MAX_RETRIES + 1):
+            try:
+                response = await api_schedulers["openai"].call(request, PRIORITY_INTERACTIVE)
+                break
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == Config.TRANSCRIPTION_MAX_RETRIES:
+                    raise
+                delay = min(0.5 * 2 ** attempt, 8)
+                logger.warning(f"Whisper request failed ({e}), retrying in {delay:.1f}s (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
         
         # Response is just the text string
-        text = response.strip() if isinstance(response, str) else str(response).strip()
+        return response.strip() if isinstance(response, str) else str(response).strip()
+
+
+class LocalSpeechBackend(SpeechToTextBackend):
+    """
+    On-CPU transcription with a user-provided TorchScript model.
+    
+    The model at LOCAL_STT_MODEL is loaded once and called as model(waveform) -> str,
+    where waveform is a (1, samples) float32 tensor of mono audio at AUDIO_SAMPLE_RATE
+    (e.g. a scripted wav2vec2 + greedy CTC decoder). Inference runs in a worker pool.
+    """
+    
+    name = "local"
+    
+    def __init__(self, model_path: str = Config.LOCAL_STT_MODEL, workers: int = Config.LOCAL_STT_WORKERS):
+        self.model_path = model_path
+        self._model = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-stt")
+    
+    def is_available(self) -> bool:
+        return os.path.exists(self.model_path)
+    
+    def _load(self):
+        """Load and cache the model (once per process)"""
+        if self._model is not None:
+            return self._model
+        
+        with self._lock:
+            if self._model is None:
+                import torch  # Heavy import, only paid when local transcription is actually used
+                
+                start = time.perf_counter()
+                self._model = torch.jit.load(self.model_path, map_location="cpu").eval()
+                elapsed = time.perf_counter() - start
+                metrics.observe("transcription.load.local", elapsed)
+                logger.info(f"Local speech model loaded in {elapsed:.2f}s")
+            return self._model
+    
+    def warm_up(self) -> None:
+        try:
+            self._load()
+        except Exception as e:
+            logger.error(f"Could not load local speech model: {e}")
+    
+    def transcribe_samples(self, audio: np.ndarray) -> str:
+        """Blocking transcription of decoded (frames, channels) samples"""
+        import torch
+        
+        model = self._load()
+        waveform = torch.from_numpy(np.ascontiguousarray(audio.mean(axis=1)))[None]
+        with torch.inference_mode():
+            return str(model(waveform)).strip()
+    
+    def transcribe_bytes(self, audio_bytes: bytes) -> str:
+        """Blocking decode + transcription, run on the worker pool"""
+        audio = decode_audio(audio_bytes)
+        if not len(audio):
+            logger.info("Voice message is silent, skipping transcription")
+            return ""
+        return self.transcribe_samples(audio)
+    
+    async def transcribe(self, audio_bytes: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.transcribe_bytes, audio_bytes)
+
+
+STT_BACKENDS = {
+    "remote": RemoteWhisperBackend,
+    "local": LocalSpeechBackend,
+}
+
+
+def create_stt_backend(name: str = Config.STT_BACKEND) -> SpeechToTextBackend:
+    """The configured backend, or the remote one if the local model is missing"""
+    if name not in STT_BACKENDS:
+        raise ValueError(f"Unknown STT_BACKEND: {name}. Use one of {', '.join(STT_BACKENDS)}")
+    backend = STT_BACKENDS[name]()
+    if not backend.is_available():
+        logger.warning(f"Speech backend '{name}' is not available, using OpenAI Whisper")
+        backend = RemoteWhisperBackend()
+    return backend
+
+
+# Global instance for easy import
+stt_backend = create_stt_backend()
+
+
+class TranscriptionCache:
+    """
+    Size-bounded LRU cache of transcripts keyed by Telegram file_unique_id, so a
+    forwarded or resent voice note is neither downloaded nor transcribed again
+    """
+    
+    def __init__(self, max_size: int = Config.TRANSCRIPTION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+    
+    def get(self, file_unique_id: Optional[str]) -> Optional[str]:
+        text = self._entries.get(file_unique_id) if file_unique_id else None
+        if text is None:
+            metrics.increment("transcription_cache.misses")
+            return None
+        self._entries.move_to_end(file_unique_id)
+        metrics.increment("transcription_cache.hits")
+        return text
+    
+    def put(self, file_unique_id: Optional[str], text: str) -> None:
+        """Store a transcript; empty ones are not cached so a failed attempt can be retried"""
+        if not file_unique_id or not text:
+            return
+        self._entries[file_unique_id] = text
+        self._entries.move_to_end(file_unique_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global instance for easy import
+transcription_cache = TranscriptionCache()
+
+
+async def transcribe_audio_memory(audio_buffer: io.BytesIO) -> str:
+    """
+    Speech-to-Text directly from a memory buffer, using the configured STT backend
+    """
+    try:
+        start = time.perf_counter()
+        try:
+            text = await stt_backend.transcribe(audio_buffer.getvalue())
+        finally:
+            metrics.observe(f"transcription.latency.{stt_backend.name}", time.perf_counter() - start)
         
         if not text:
-            logger.warning("Empty transcription result from OpenAI")
+            logger.warning(f"Empty transcription result from {stt_backend.name} backend")
             return ""
             
         logger.info(f"✅ Transcribed: {text!r}")
         return text
 
     except Exception as e:
-        logger.error(f"⚠️ OpenAI Whisper transcription failed: {e}")
+        logger.error(f"⚠️ Transcription failed ({stt_backend.name} backend): {e}")
         return ""
 
 
@@ -74,7 +372,7 @@ def transcribe_audio(audio_path: str) -> str:
     logger.warning("Legacy transcribe_audio called - consider using transcribe_audio_memory")
     try:
         with open(audio_path, "rb") as audio_file:
-            client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+            client = openai.OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
             response = client.audio.transcriptions.create(
                 model="whisper-1",
                 file=audio_file,
@@ -2,7 +2,10 @@ import logging
 import aiohttp
 import json
 import os
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
+from config import Config
+from services.http_session import http_pool
+from services.api_scheduler import api_schedulers, parse_retry_after, RateLimited, PRIORITY_INTERACTIVE, PRIORITY_BATCH
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +20,7 @@ class SynthesiaClient:
         if not self.api_key:
             raise ValueError("SYNTHESIA_API environment variable not found")
         
-        self.base_url = "https://api.synthesia.io/v2"
+        self.base_url = Config.SYNTHESIA_BASE_URL
         self.headers = {
             "Authorization": self.api_key,
             "Content-Type": "application/json"
@@ -54,22 +57,14 @@ class SynthesiaClient:
                 }]
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/videos",
-                    headers=self.headers,
-                    json=video_data,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 201:
-                        result = await response.json()
-                        logger.info(f"Video creation started: {result.get('id')}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Synthesia API error: {response.status} - {error_text}")
-                        return None
-                        
+            status, result = await self._request("POST", "/videos", timeout=30, json=video_data)
+            if status == 201:
+                logger.info(f"Video creation started: {result.get('id')}")
+                return result
+            else:
+                logger.error(f"Synthesia API error: {status} - {result}")
+                return None
+                    
         except Exception as e:
             logger.error(f"Error creating video: {e}")
             return None
@@ -85,23 +80,52 @@ class SynthesiaClient:
             Dictionary with video status or None if failed
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/videos/{video_id}",
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        logger.error(f"Failed to get video status: {response.status}")
-                        return None
-                        
+            # Status polling is background work - it yields to video creation requests
+            status, result = await self._request(
+                "GET", f"/videos/{video_id}", timeout=10, priority=PRIORITY_BATCH
+            )
+            if status == 200:
+                return result
+            else:
+                logger.error(f"Failed to get video status: {status}")
+                return None
+                    
         except Exception as e:
             logger.error(f"Error getting video status: {e}")
             return None
 
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        timeout: float,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs
+    ) -> Tuple[int, Any]:
+        """
+        Call the Synthesia API within its rate limit, retrying after 429s.
+        Returns the status and the JSON body on success, or the error text.
+        """
+        async def request() -> Tuple[int, Any]:
+            session = http_pool.get()
+            async with session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                **kwargs
+            ) as response:
+                if response.status == 429:
+                    raise RateLimited(parse_retry_after(response.headers), await response.text())
+                if response.status in (200, 201):
+                    return response.status, await response.json()
+                return response.status, await response.text()
+        
+        try:
+            return await api_schedulers["synthesia"].call(request, priority)
+        except RateLimited as e:
+            return 429, e.body
+
     async def get_video_download_url(self, video_id: str) -> Optional[str]:
         """
         Get the download URL for a completed video.
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded analysis job queue: ordering, caps, weights and cancellation
+"""
+
+import sys
+import asyncio
+import traceback
+from services.analysis_queue import AnalysisQueue, AnalysisQueueFull
+
+
+async def settle():
+    """Let every ready task run until they are all waiting again"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def check_fifo_order():
+    print("1. Waiting jobs start in arrival order...")
+    queue = AnalysisQueue(max_concurrent=1, max_per_user=1, max_waiting=10)
+    release = asyncio.Event()
+    started = []
+
+    def job(user_id):
+        async def run():
+            started.append(user_id)
+            await release.wait()
+        return run
+
+    tasks = [asyncio.create_task(queue.run(user_id, job(user_id))) for user_id in (1, 2, 3, 4)]
+    await settle()
+    assert started == [1], started
+    assert queue.stats() == {"waiting": 3, "running": 1, "slots": 1}, queue.stats()
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started == [1, 2, 3, 4], started
+    assert queue.stats() == {"waiting": 0, "running": 0, "slots": 0}, queue.stats()
+    print("✅ Jobs ran in FIFO order")
+
+
+async def check_per_user_cap():
+    print("\n2. A user at their cap doesn't block other users...")
+    queue = AnalysisQueue(max_concurrent=2, max_per_user=1, max_waiting=10)
+    release = asyncio.Event()
+    started = []
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await release.wait()
+        return run
+
+    tasks = [
+        asyncio.create_task(queue.run(1, job("user 1 first"))),
+        asyncio.create_task(queue.run(1, job("user 1 second"))),
+        asyncio.create_task(queue.run(2, job("user 2"))),
+    ]
+    await settle()
+    assert started == ["user 1 first", "user 2"], started
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started[-1] == "user 1 second", started
+    print("✅ User 2 skipped ahead of user 1's second job")
+
+
+async def check_positions_and_capacity():
+    print("\n3. Queue positions are reported and a full queue rejects jobs...")
+    queue = AnalysisQueue(max_concurrent=1, max_per_user=1, max_waiting=2)
+    releases = {user_id: asyncio.Event() for user_id in (1, 2, 3, 4)}
+    positions = []
+
+    def job(user_id):
+        async def run():
+            await releases[user_id].wait()
+        return run
+
+    async def record(position):
+        positions.append(position)
+
+    tasks = [
+        asyncio.create_task(queue.run(1, job(1))),
+        asyncio.create_task(queue.run(2, job(2))),
+        asyncio.create_task(queue.run(3, job(3), on_position=record)),
+    ]
+    await settle()
+    assert positions == [2], positions
+
+    try:
+        await queue.run(4, job(4))
+        raise AssertionError("expected AnalysisQueueFull")
+    except AnalysisQueueFull:
+        pass
+
+    # Finish the jobs ahead one at a time so the waiter sees each move
+    releases[1].set()
+    await settle()
+    assert positions == [2, 1], positions
+    releases[2].set()
+    releases[3].set()
+    await asyncio.gather(*tasks)
+    assert positions == [2, 1], positions
+    print(f"✅ Positions reported: {positions}, extra job rejected")
+
+
+async def check_cancel_user():
+    print("\n4. Cancelling a user frees their running and waiting slots...")
+    queue = AnalysisQueue(max_concurrent=1, max_per_user=2, max_waiting=10)
+    release = asyncio.Event()
+    finished = []
+
+    def job(name):
+        async def run():
+            await release.wait()
+            finished.append(name)
+        return run
+
+    running = asyncio.create_task(queue.run(1, job("user 1 running")))
+    waiting = asyncio.create_task(queue.run(1, job("user 1 waiting")))
+    other = asyncio.create_task(queue.run(2, job("user 2")))
+    await settle()
+
+    cancelled = queue.cancel_user(1)
+    assert cancelled == 2, cancelled
+    await settle()
+    assert running.cancelled() and waiting.cancelled()
+    assert queue.stats() == {"waiting": 0, "running": 1, "slots": 1}, queue.stats()
+
+    release.set()
+    await other
+    assert finished == ["user 2"], finished
+    assert queue.stats() == {"waiting": 0, "running": 0, "slots": 0}, queue.stats()
+    print("✅ User 1's jobs cancelled, user 2's job ran")
+
+
+async def check_weighted_jobs():
+    print("\n5. A job analysing several photos takes one slot per photo...")
+    queue = AnalysisQueue(max_concurrent=3, max_per_user=2, max_waiting=10)
+    release = asyncio.Event()
+    started = []
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await release.wait()
+        return run
+
+    assert queue.max_weight() == 2, queue.max_weight()
+    tasks = [
+        asyncio.create_task(queue.run(1, job("user 1 album"), weight=5)),  # capped at 2 slots
+        asyncio.create_task(queue.run(2, job("user 2 album"), weight=2)),
+        asyncio.create_task(queue.run(3, job("user 3 photo"))),
+    ]
+    await settle()
+    # Only 1 of 3 slots is left, so user 2's album waits and holds back user 3
+    assert started == ["user 1 album"], started
+    assert queue.stats() == {"waiting": 2, "running": 1, "slots": 2}, queue.stats()
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started == ["user 1 album", "user 2 album", "user 3 photo"], started
+    assert queue.stats() == {"waiting": 0, "running": 0, "slots": 0}, queue.stats()
+    print("✅ Albums counted against the caps by weight")
+
+
+async def check_cancel_tracked():
+    print("\n6. Cancelling a user also cancels a task that hasn't queued yet...")
+    queue = AnalysisQueue(max_concurrent=1, max_per_user=1, max_waiting=10)
+
+    async def collect_then_queue():
+        await asyncio.sleep(10)  # e.g. waiting for the rest of an album
+        await queue.run(1, asyncio.sleep, weight=1)
+
+    collector = asyncio.create_task(collect_then_queue())
+    queue.track(1, collector)
+    await settle()
+    assert queue.cancel_user(1) == 1
+    await settle()
+    assert collector.cancelled()
+    assert queue.cancel_user(1) == 0
+    print("✅ Tracked collector cancelled and forgotten")
+
+
+def test_analysis_queue():
+    """Run every analysis queue check"""
+    try:
+        print("🧪 Testing Analysis Queue")
+        print("=" * 60)
+
+        async def run_checks():
+            await check_fifo_order()
+            await check_per_user_cap()
+            await check_positions_and_capacity()
+            await check_cancel_user()
+            await check_weighted_jobs()
+            await check_cancel_tracked()
+
+        asyncio.run(run_checks())
+
+        print("\n" + "=" * 60)
+        print("🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Error during testing: {e!r}")
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    success = test_analysis_queue()
+    sys.exit(0 if success else 1)
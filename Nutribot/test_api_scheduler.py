@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the priority token bucket scheduler: ordering, 429 retry, unlimited rates and raised priorities
+"""
+
+import sys
+import time
+import asyncio
+import traceback
+from services.api_scheduler import (
+    CallPriority,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_INTERPRETATION,
+    RateLimited,
+    TokenBucketScheduler,
+    parse_retry_after,
+)
+
+
+async def check_priority_order():
+    print("1. Higher priority waiters get the next token first...")
+    scheduler = TokenBucketScheduler("test", requests_per_minute=600, burst=1, max_retries=0)
+    await scheduler.acquire()  # use up the burst so everyone below has to wait
+    order = []
+
+    async def wait_for_token(name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    # Queued lowest priority first, so only the priority can put them in order
+    tasks = [
+        asyncio.create_task(wait_for_token("batch", PRIORITY_BATCH)),
+        asyncio.create_task(wait_for_token("interpretation", PRIORITY_INTERPRETATION)),
+        asyncio.create_task(wait_for_token("interactive 1", PRIORITY_INTERACTIVE)),
+        asyncio.create_task(wait_for_token("interactive 2", PRIORITY_INTERACTIVE)),
+    ]
+    await asyncio.gather(*tasks)
+    assert order == ["interactive 1", "interactive 2", "interpretation", "batch"], order
+    print(f"✅ Tokens handed out in order: {order}")
+
+
+async def check_rate_limit_retry():
+    print("\n2. A 429 pauses the API for Retry-After, then the call is retried...")
+    scheduler = TokenBucketScheduler("test", requests_per_minute=0, burst=1, max_retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RateLimited(retry_after=0.2)
+        return "ok"
+
+    start = time.monotonic()
+    result = await scheduler.call(flaky)
+    assert result == "ok", result
+    assert len(attempts) == 3, attempts
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert all(gap >= 0.19 for gap in gaps), gaps
+    print(f"✅ Succeeded on attempt 3 after {time.monotonic() - start:.2f}s")
+
+    # The pause holds every caller of the API, not just the one that was throttled
+    async def throttled():
+        raise RateLimited(retry_after=0.3)
+
+    failing = asyncio.create_task(scheduler.call(throttled))
+    await asyncio.sleep(0.05)
+    start = time.monotonic()
+    await scheduler.acquire()
+    waited = time.monotonic() - start
+    assert waited >= 0.2, waited
+    print(f"✅ Another caller waited {waited:.2f}s while the API was paused")
+
+    try:
+        await failing
+        raise AssertionError("expected RateLimited once retries ran out")
+    except RateLimited as e:
+        assert e.retry_after == 0.3, e.retry_after
+    print("✅ RateLimited re-raised after max_retries")
+
+
+async def check_unlimited_rate():
+    print("\n3. A rate of 0 means unlimited...")
+    for rpm in (0, -1):
+        scheduler = TokenBucketScheduler("test", requests_per_minute=rpm, burst=1, max_retries=0)
+        start = time.monotonic()
+        await asyncio.wait_for(asyncio.gather(*(scheduler.acquire() for _ in range(50))), timeout=1)
+        elapsed = time.monotonic() - start
+        assert elapsed < 0.5, elapsed
+        print(f"✅ 50 calls at {rpm} rpm took {elapsed * 1000:.0f}ms")
+
+
+def check_parse_retry_after():
+    print("\n5. Retry-After headers are parsed...")
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"Retry-After": "2"}) == 2.0
+    assert parse_retry_after({"Retry-After": "Thu, 01 Jan 1970 00:00:00 GMT"}) == 0.0
+    assert parse_retry_after({"Retry-After": "soon"}) is None
+    assert parse_retry_after({}) is None
+    print("✅ Milliseconds, seconds, HTTP dates and bad values handled")
+
+
+async def check_priority_raised():
+    print("\n4. A waiting call can be moved up to a more urgent priority...")
+    scheduler = TokenBucketScheduler("test", requests_per_minute=600, burst=1, max_retries=0)
+    await scheduler.acquire()
+    order = []
+
+    async def wait_for_token(name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    coalesced = CallPriority(PRIORITY_BATCH)
+    tasks = [
+        asyncio.create_task(wait_for_token("interpretation", PRIORITY_INTERPRETATION)),
+        asyncio.create_task(wait_for_token("coalesced batch", coalesced)),
+    ]
+    await asyncio.sleep(0.01)
+    coalesced.raise_to(PRIORITY_INTERACTIVE)  # an interactive caller joined it
+    coalesced.raise_to(PRIORITY_BATCH)  # lowering is ignored
+    await asyncio.gather(*tasks)
+    assert order == ["coalesced batch", "interpretation"], order
+    assert coalesced.value == PRIORITY_INTERACTIVE, coalesced.value
+    print(f"✅ Tokens handed out in order: {order}")
+
+
+def test_api_scheduler():
+    """Run every scheduler check"""
+    try:
+        print("🧪 Testing API Scheduler")
+        print("=" * 60)
+
+        async def run_checks():
+            await check_priority_order()
+            await check_rate_limit_retry()
+            await check_unlimited_rate()
+            await check_priority_raised()
+
+        asyncio.run(run_checks())
+        check_parse_retry_after()
+
+        print("\n" + "=" * 60)
+        print("🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Error during testing: {e!r}")
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    success = test_api_scheduler()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for voice command intent matching: inflections, specificity and whole words
+"""
+
+import sys
+import traceback
+from constants import KEYWORD_TRIGGERS
+from utils.intent_matcher import IntentMatcher
+
+# Same intents as handlers/speech_handler.py routes (it has no handler for "watering")
+VOICE_INTENTS = IntentMatcher({
+    intent: keywords for intent, keywords in KEYWORD_TRIGGERS.items() if intent != "watering"
+})
+
+CASES = [
+    # Inflected forms of a trigger word
+    ("I am scanning my compost", "scan", "scan"),
+    ("I watered it yesterday", "input", "water"),
+    ("watering schedule please", "care", "watering"),
+    ("I was extracting compost", "compost_extract", "extract"),
+    ("how much did I save in emissions", "co2", "emission"),
+    ("is it readying", "compost_extract", "ready"),
+    ("tips for caring", "care", "care"),
+    # Plurals and the most specific phrase
+    ("show me the photos", "scan", "photo"),
+    ("scan images", "scan", "scan image"),
+    ("compost feed", "compost_feed", "compost feed"),
+    ("show help commands", "help_commands", "help commands"),
+    # Whole words only
+    ("is it already done", None, None),
+    ("the inputted value", "input", "input"),
+    ("the plantation", None, None),
+]
+
+
+def test_intent_matcher():
+    """Check the intent picked for a set of transcribed utterances"""
+    try:
+        print("🧪 Testing Voice Intent Matching")
+        print("=" * 60)
+
+        failures = 0
+        for i, (text, intent, keyword) in enumerate(CASES, 1):
+            match = VOICE_INTENTS.best(text)
+            got = (match["intent"], match["keyword"]) if match else (None, None)
+            if got == (intent, keyword):
+                print(f"{i}. ✅ {text!r} -> {got[0]} ({got[1]!r})")
+            else:
+                failures += 1
+                print(f"{i}. ❌ {text!r} -> {got}, expected {(intent, keyword)}")
+
+        match = VOICE_INTENTS.best("I am scanning my compost")
+        span_text = "I am scanning my compost"[slice(*match["span"])]
+        if span_text != "scanning":
+            failures += 1
+            print(f"❌ Span covers {span_text!r}, expected 'scanning'")
+        else:
+            print("✅ Span covers the inflected word")
+
+        print("\n" + "=" * 60)
+        if failures:
+            print(f"❌ {failures} case(s) failed")
+            return False
+        print("🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Error during testing: {e!r}")
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    success = test_intent_matcher()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the scan result cache: perceptual hashing, lookups and LRU eviction
+"""
+
+import io
+import sys
+import traceback
+import numpy as np
+from PIL import Image
+from services.scan_cache import ScanResultCache, hamming_distance, perceptual_hash
+
+
+def make_photo(seed: int, brightness: float = 0.0) -> bytes:
+    """A JPEG of smooth random blobs, optionally brightened"""
+    rng = np.random.default_rng(seed)
+    small = rng.uniform(0, 255, (8, 8, 3)).astype(np.uint8)
+    image = Image.fromarray(small).resize((256, 256), Image.BICUBIC)
+    pixels = np.clip(np.asarray(image, dtype=np.float64) + brightness, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def check_perceptual_hash():
+    print("1. Near-identical photos hash close together, different ones don't...")
+    original = perceptual_hash(make_photo(1))
+    brightened = perceptual_hash(make_photo(1, brightness=10))
+    other = perceptual_hash(make_photo(2))
+    near, far = hamming_distance(original, brightened), hamming_distance(original, other)
+    assert near <= 6, near
+    assert far > 6, far
+    print(f"✅ Brightened copy differs by {near} bits, another photo by {far}")
+
+
+def check_lookups():
+    print("\n2. Results are found by file id, exact hash and nearby hash...")
+    cache = ScanResultCache(max_size=10, max_distance=4)
+    result = {"concepts": [{"name": "dry-leaves", "value": 0.9}]}
+    cache.put("compost", 0b1111_0000, result, file_unique_id="file-1")
+
+    hit = cache.get_by_file_id("compost", "file-1")
+    assert hit == dict(result, cached=True), hit
+    assert "cached" not in result, result
+    assert cache.get_by_file_id("compost", None) is None
+    assert cache.get_by_file_id("plant", "file-1") is None
+
+    assert cache.get_by_hash("compost", 0b1111_0000) is not None
+    assert cache.get_by_hash("compost", 0b1111_0011) is not None  # 2 bits away
+    assert cache.get_by_hash("compost", 0b0000_1111) is None  # 8 bits away
+    assert cache.get_by_hash("plant", 0b1111_0000) is None
+    print("✅ Hits are copies marked cached, misses stay per scan type")
+
+
+def check_lru_eviction():
+    print("\n3. The least recently used entry is evicted beyond max_size...")
+    cache = ScanResultCache(max_size=2, max_distance=0)
+    cache.put("compost", 1, {"name": "first"}, file_unique_id="file-1")
+    cache.put("compost", 2, {"name": "second"}, file_unique_id="file-2")
+    cache.get_by_hash("compost", 1)  # first is now the most recently used
+    cache.put("compost", 4, {"name": "third"}, file_unique_id="file-3")
+
+    assert len(cache) == 2, len(cache)
+    assert cache.get_by_hash("compost", 2) is None
+    assert cache.get_by_file_id("compost", "file-2") is None
+    assert cache.get_by_file_id("compost", "file-1")["name"] == "first"
+    assert cache.get_by_file_id("compost", "file-3")["name"] == "third"
+    print("✅ The untouched entry and its file id were evicted")
+
+
+def test_scan_cache():
+    """Run every scan cache check"""
+    try:
+        print("🧪 Testing Scan Result Cache")
+        print("=" * 60)
+
+        check_perceptual_hash()
+        check_lookups()
+        check_lru_eviction()
+
+        print("\n" + "=" * 60)
+        print("🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Error during testing: {e!r}")
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    success = test_scan_cache()
+    sys.exit(0 if success else 1)
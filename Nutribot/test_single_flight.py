@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight request coalescing: sharing, cancellation and progress fan-out
+"""
+
+import sys
+import asyncio
+import traceback
+from utils.single_flight import SingleFlight
+
+
+async def check_coalescing():
+    print("1. Identical concurrent calls share one upstream call...")
+    flight = SingleFlight("test")
+    upstream_calls = []
+
+    def call_for(key):
+        async def call(publish):
+            upstream_calls.append(key)
+            await asyncio.sleep(0.05)
+            return f"answer for {key}"
+        return call
+
+    results = await asyncio.gather(
+        *(flight.run("a", call_for("a")) for _ in range(3)),
+        flight.run("b", call_for("b")),
+    )
+    assert results == ["answer for a"] * 3 + ["answer for b"], results
+    assert sorted(upstream_calls) == ["a", "b"], upstream_calls
+    assert (flight.calls, flight.saved) == (2, 2), (flight.calls, flight.saved)
+
+    # Once it has finished, the next call goes upstream again
+    await flight.run("a", call_for("a"))
+    assert upstream_calls.count("a") == 2, upstream_calls
+    print(f"✅ {flight.calls} upstream calls for {flight.calls + flight.saved} requests")
+
+
+async def check_errors_shared():
+    print("\n2. A failed call fails every waiting caller...")
+    flight = SingleFlight("test")
+
+    async def failing(publish):
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(flight.run("a", failing) for _ in range(2)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results), results
+    assert flight.calls == 1, flight.calls
+    print("✅ Both callers got the upstream error")
+
+
+async def check_leader_cancellation():
+    print("\n3. Cancelling the first caller doesn't cancel the call for the others...")
+    flight = SingleFlight("test")
+    leader_progress, follower_progress = [], []
+
+    async def streaming(publish):
+        for i in range(5):
+            await asyncio.sleep(0.02)
+            await publish(i)
+        return "done"
+
+    def record(progress):
+        async def listener(value):
+            progress.append(value)
+        return listener
+
+    leader = asyncio.create_task(flight.run("a", streaming, on_progress=record(leader_progress)))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("a", streaming, on_progress=record(follower_progress)))
+    await asyncio.sleep(0.05)
+    leader.cancel()
+
+    assert await follower == "done"
+    assert leader.cancelled()
+    assert follower_progress == [0, 1, 2, 3, 4], follower_progress
+    assert 0 < len(leader_progress) < 5, leader_progress
+    assert flight.calls == 1, flight.calls
+    print(f"✅ Follower got every update, the cancelled leader stopped after {len(leader_progress)}")
+
+
+async def check_progress_fan_out():
+    print("\n4. Progress reaches every caller, even if one listener fails...")
+    flight = SingleFlight("test")
+    received = {"first": [], "second": []}
+
+    async def streaming(publish):
+        await asyncio.sleep(0.02)
+        for word in ("compost", "needs", "air"):
+            await publish(word)
+        return "compost needs air"
+
+    def listener(name):
+        async def on_progress(value):
+            received[name].append(value)
+        return on_progress
+
+    async def broken(value):
+        raise RuntimeError("message edit failed")
+
+    results = await asyncio.gather(
+        flight.run("a", streaming, on_progress=listener("first")),
+        flight.run("a", streaming, on_progress=broken),
+        flight.run("a", streaming, on_progress=listener("second")),
+        flight.run("a", streaming),
+    )
+    assert results == ["compost needs air"] * 4, results
+    assert received["first"] == received["second"] == ["compost", "needs", "air"], received
+    assert not flight._listeners, flight._listeners
+    print("✅ Both working listeners received every update")
+
+
+def test_single_flight():
+    """Run every single-flight check"""
+    try:
+        print("🧪 Testing Single-Flight Coalescing")
+        print("=" * 60)
+
+        async def run_checks():
+            await check_coalescing()
+            await check_errors_shared()
+            await check_leader_cancellation()
+            await check_progress_fan_out()
+
+        asyncio.run(run_checks())
+
+        print("\n" + "=" * 60)
+        print("🎉 All tests completed!")
+
+    except Exception as e:
+        print(f"❌ Error during testing: {e!r}")
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    success = test_single_flight()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,82 @@
+"""
+Keyword intent matching for voice commands.
+
+Every trigger phrase is compiled into one alternation regex, longest phrases first,
+inside a lookahead, so a single left-to-right scan finds the longest phrase starting
+at each word - including overlapping ones ("show help" and "help commands"). The most
+specific match (most words, then longest) decides the intent, so "compost feed" wins
+over "feed" and dict order no longer matters. A phrase listed under several intents
+goes to the intent with the smallest, most focused vocabulary. The last word of a
+phrase also matches its common inflections, so "scan" fires on "scanning" and
+"water" on "watered".
+"""
+
+import re
+from typing import Dict, List, Optional
+
+
+class IntentMatcher:
+    """Compiled multi-phrase matcher from {intent: [trigger phrases]}"""
+
+    def __init__(self, triggers: Dict[str, List[str]]):
+        # phrase -> intents listing it, most focused (fewest phrases) first, then dict order
+        self._intents: Dict[str, List[str]] = {}
+        order = {intent: i for i, intent in enumerate(triggers)}
+        for intent, phrases in triggers.items():
+            for phrase in phrases:
+                phrase = " ".join(phrase.lower().split())
+                if phrase and intent not in self._intents.setdefault(phrase, []):
+                    self._intents[phrase].append(intent)
+        for intents in self._intents.values():
+            intents.sort(key=lambda intent: (len(triggers[intent]), order[intent]))
+
+        # Whole words only (so "ready" doesn't fire on "already"), one named group per phrase
+        self._phrases = sorted(self._intents, key=len, reverse=True)
+        alternation = "|".join(
+            rf"(?P<p{i}>{self._phrase_pattern(phrase)})" for i, phrase in enumerate(self._phrases)
+        )
+        self._pattern = re.compile(rf"(?<!\w)(?=(?:{alternation})(?!\w))", re.IGNORECASE)
+
+    @staticmethod
+    def _inflect(word: str) -> str:
+        """Pattern for a word and its -s/-es/-ed/-ing forms, with dropped e, y -> i and doubled consonants"""
+        if not word.isalpha() or len(word) < 3:
+            return re.escape(word) + "s?"
+        if word.endswith("e"):
+            return rf"{word[:-1]}(?:e[sd]?|ing)"
+        if word.endswith("y") and word[-2] not in "aeiou":
+            return rf"{word[:-1]}(?:y|ies|ied|ying)"
+        if word[-1] not in "aeiouwxy" and word[-2] in "aeiou":
+            return rf"{word}(?:s|es|ed|ing|{word[-1]}(?:ed|ing))?"
+        return rf"{word}(?:s|es|ed|ing)?"
+
+    @classmethod
+    def _phrase_pattern(cls, phrase: str) -> str:
+        words = phrase.split()
+        return r"\s+".join([*map(re.escape, words[:-1]), cls._inflect(words[-1])])
+
+    @staticmethod
+    def score(phrase: str) -> float:
+        """Specificity of a phrase: its word count, broken by length"""
+        return len(phrase.split()) + len(phrase) / 100
+
+    def matches(self, text: str) -> List[Dict]:
+        """The longest trigger starting at each word of the text, in order, with its span and score"""
+        results = []
+        for match in self._pattern.finditer(text):
+            phrase = self._phrases[int(match.lastgroup[1:])]
+            results.append({
+                "intent": self._intents[phrase][0],
+                "keyword": phrase,
+                "span": match.span(match.lastgroup),
+                "score": round(self.score(phrase), 2),
+            })
+        return results
+
+    def best(self, text: str) -> Optional[Dict]:
+        """The most specific match (earliest on ties), or None"""
+        best = None
+        for match in self.matches(text):
+            if best is None or match["score"] > best["score"]:
+                best = match
+        return best
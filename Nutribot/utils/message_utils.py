@@ -1,11 +1,18 @@
 """
 Utility functions for common message patterns and keyboard creation
 """
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import logging
+import time
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
 from typing import List, Dict, Optional
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
 # Common error messages
 ERROR_MESSAGES = {
     "not_logged_in": "Please /start to login first.",
@@ -111,4 +118,73 @@ def get_cached_user_data(telegram_id: int, context: ContextTypes.DEFAULT_TYPE) -
 
 def clear_user_cache(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Clear cached user data. Call after profile updates."""
-    context.user_data.pop("profile_data", None)
\ No newline at end of file
+    context.user_data.pop("profile_data", None)
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split text into chunks under Telegram's message length limit,
+    breaking on blank lines, then newlines, where possible.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+class StreamingReply:
+    """
+    A reply that grows as streamed text arrives.
+
+    The first update sends the reply, later ones edit it in place no more than
+    once every STREAM_EDIT_INTERVAL seconds to stay inside Telegram's edit rate
+    limits. finish() writes the final text, sending a plain reply if nothing
+    was streamed.
+    """
+
+    def __init__(self, reply_to: Message, header: str = "", interval: float = Config.STREAM_EDIT_INTERVAL):
+        self.reply_to = reply_to
+        self.header = header
+        self.interval = interval
+        self.message: Optional[Message] = None
+        self._last_text = ""
+        self._next_edit = 0.0
+
+    async def update(self, text: str) -> None:
+        """Show the text received so far, if an edit is due"""
+        if time.monotonic() < self._next_edit:
+            return
+        # Keep the header and the newest text if the stream outgrows one message
+        tail = text[-(TELEGRAM_MESSAGE_LIMIT - len(self.header) - 2):]
+        await self._show(f"{self.header}{tail} ▌")
+
+    async def finish(self, text: str, **kwargs) -> Message:
+        """Replace the streamed text with the final message"""
+        if self.message is None:
+            self.message = await self.reply_to.reply_text(text, **kwargs)
+            return self.message
+        if text != self._last_text or kwargs:
+            await self.message.edit_text(text, **kwargs)
+        return self.message
+
+    async def _show(self, text: str) -> None:
+        try:
+            if self.message is None:
+                self.message = await self.reply_to.reply_text(text)
+            elif text != self._last_text:
+                await self.message.edit_text(text)
+            self._last_text = text
+            self._next_edit = time.monotonic() + self.interval
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            self._next_edit = time.monotonic() + retry_after
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Streaming message update failed: {e}")
@@ -0,0 +1,156 @@
+"""
+Lightweight in-process metrics for timing hot paths and counting events.
+
+Timers keep a bounded window of recent durations per stage so percentiles can be
+reported through the logger or the /metrics endpoint. Everything is a no-op when
+METRICS_ENABLED is off.
+"""
+import asyncio
+import functools
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Sequence
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsRegistry:
+    """Thread-safe registry of stage timers and counters"""
+
+    def __init__(self, enabled: bool = True, window: int = 1024, log_interval: int = 0):
+        self.enabled = enabled
+        self.window = window
+        self.log_interval = log_interval
+        self._timings: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._timing_counts: Dict[str, int] = defaultdict(int)
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_log = time.monotonic()
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the enclosed block and record it under `name`"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """Decorator form of timer() for sync and async functions"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration in seconds"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._timings[name].append(seconds)
+            self._timing_counts[name] += 1
+        self._maybe_log_summary()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Record the current value of something that goes up and down (e.g. queue depth)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def percentiles(self, name: str, quantiles: Sequence[int] = (50, 90, 95, 99)) -> Dict[str, float]:
+        """Nearest-rank percentiles in milliseconds over the recent window"""
+        with self._lock:
+            samples = sorted(self._timings.get(name, ()))
+        if not samples:
+            return {}
+        result = {}
+        for q in quantiles:
+            rank = max(0, min(len(samples) - 1, math.ceil(q / 100 * len(samples)) - 1))
+            result[f"p{q}_ms"] = round(samples[rank] * 1000, 2)
+        result["max_ms"] = round(samples[-1] * 1000, 2)
+        return result
+
+    def snapshot(self) -> Dict:
+        """All timers (with percentiles) and counters as a JSON-friendly dict"""
+        with self._lock:
+            timer_names = list(self._timings)
+            timing_counts = dict(self._timing_counts)
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        timers = {}
+        for name in sorted(timer_names):
+            timers[name] = {"count": timing_counts.get(name, 0), **self.percentiles(name)}
+        return {
+            "enabled": self.enabled,
+            "timers": timers,
+            "counters": dict(sorted(counters.items())),
+            "gauges": dict(sorted(gauges.items())),
+        }
+
+    def log_summary(self) -> None:
+        """Write one line per timer and the counters to the log"""
+        snapshot = self.snapshot()
+        for name, stats in snapshot["timers"].items():
+            logger.info(
+                f"[metrics] {name}: n={stats['count']} p50={stats.get('p50_ms')}ms "
+                f"p90={stats.get('p90_ms')}ms p95={stats.get('p95_ms')}ms p99={stats.get('p99_ms')}ms max={stats.get('max_ms')}ms"
+            )
+        if snapshot["counters"]:
+            logger.info(f"[metrics] counters: {snapshot['counters']}")
+        if snapshot["gauges"]:
+            logger.info(f"[metrics] gauges: {snapshot['gauges']}")
+
+    def reset(self) -> None:
+        """Drop all recorded timings, counters and gauges"""
+        with self._lock:
+            self._timings.clear()
+            self._timing_counts.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def _maybe_log_summary(self) -> None:
+        if not self.log_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < self.log_interval:
+                return
+            self._last_log = now
+        self.log_summary()
+
+
+# Global registry for easy import
+metrics = MetricsRegistry(
+    enabled=Config.METRICS_ENABLED,
+    window=Config.METRICS_WINDOW,
+    log_interval=Config.METRICS_LOG_INTERVAL,
+)
@@ -0,0 +1,78 @@
+"""
+Single-flight coalescing for outbound calls.
+
+While a call for a key is in flight, identical calls wait for its result instead
+of making their own request. The call runs in its own task, so a caller that is
+cancelled doesn't cancel it for everyone else waiting on it. Progress the call
+publishes (e.g. streamed partial text) is fanned out to every caller still waiting.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Listener = Callable[[Any], Awaitable[None]]
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key onto one upstream call"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.saved = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._listeners: Dict[Hashable, List[Listener]] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        call: Callable[[Listener], Awaitable[T]],
+        on_progress: Optional[Listener] = None
+    ) -> T:
+        """
+        Await call(publish), or the identical call already in flight for this key.
+        Whatever the call passes to publish reaches on_progress of every waiting caller.
+        """
+        if on_progress is not None:
+            self._listeners.setdefault(key, []).append(on_progress)
+        try:
+            task = self._in_flight.get(key)
+            if task is not None and task.get_loop() is asyncio.get_running_loop():
+                self.saved += 1
+                metrics.increment(f"single_flight.{self.name}.saved")
+                logger.info(f"[{self.name}] Coalesced duplicate request ({self.saved}/{self.calls + self.saved} calls saved)")
+                return await asyncio.shield(task)
+
+            self.calls += 1
+            metrics.increment(f"single_flight.{self.name}.calls")
+            task = asyncio.ensure_future(call(lambda value: self._publish(key, value)))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            return await asyncio.shield(task)
+        finally:
+            # A caller that finished or was cancelled stops receiving progress
+            if on_progress is not None:
+                listeners = self._listeners.get(key, [])
+                if on_progress in listeners:
+                    listeners.remove(on_progress)
+                if not listeners:
+                    self._listeners.pop(key, None)
+
+    async def _publish(self, key: Hashable, value: Any) -> None:
+        for listener in list(self._listeners.get(key, ())):
+            try:
+                await listener(value)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Progress listener failed: {e}")
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the error as retrieved in case every caller was cancelled meanwhile
+        if not task.cancelled():
+            task.exception()